@@ -0,0 +1,43 @@
+"""
+Замер времени локальной фонетической проверки голосового ответа (score_pronunciation).
+
+    python bench_phonetics.py [--runs 200]
+
+Набор пар «ожидаемая фраза — распознанный текст» прогоняется --runs раз;
+печатается среднее и максимальное время одной проверки.
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
+import argparse
+import time
+
+from bot.services.phonetics import phonetics_stats, score_pronunciation
+
+CASES = [
+    ("¿Cómo te llamas?", "¿Cómo te yamas?"),
+    ("Mañana voy a la playa.", "Manana voy a la playa"),
+    ("Perdón, ¿dónde está la estación de tren más cercana?", "Perdón, ¿dónde es la estación del tren más cerca?"),
+    ("El perro corre en el parque.", "El pero corre en el parque."),
+    ("Me gusta la música.", "Me gusta la musica"),
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    times: list[float] = []
+    for _ in range(max(args.runs, 1)):
+        for expected, recognized in CASES:
+            started = time.perf_counter()
+            score_pronunciation(expected, recognized)
+            times.append((time.perf_counter() - started) * 1000)
+
+    print(f"Проверок: {len(times)}, среднее {sum(times) / len(times):.3f} мс, макс {max(times):.3f} мс")
+    print(f"Исходы: {phonetics_stats()}")
+
+
+if __name__ == "__main__":
+    main()
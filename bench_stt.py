@@ -0,0 +1,95 @@
+"""
+Замер задержки распознавания речи на наборе .ogg-файлов для обоих бэкендов.
+
+    python bench_stt.py samples/voice [--repeat 3] [--backend openai|local]
+
+Для каждого бэкенда модель сначала прогревается, затем каждый файл распознаётся
+--repeat раз; печатаются медиана, p95 и максимум по файлу и по набору.
+"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+import argparse
+import asyncio
+import io
+import statistics
+import time
+from pathlib import Path
+
+from bot.services import speech, stt_local
+from bot.services.llm import _get_llm_client, close_llm_client
+
+
+def _percentile(values: list[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def _available(backend: str) -> bool:
+    if backend == speech.LOCAL:
+        return stt_local.HAS_FASTER_WHISPER
+    return _get_llm_client() is not None
+
+
+async def _bench_backend(backend: str, files: list[Path], repeat: int) -> list[float]:
+    if backend == speech.LOCAL:
+        started = time.monotonic()
+        await speech.preload_stt(backend)
+        print(f"[{backend}] загрузка и прогрев модели: {time.monotonic() - started:.1f} с")
+    else:
+        # Первый запрос открывает соединение — в замер не входит
+        await speech.transcribe_voice(io.BytesIO(files[0].read_bytes()), files[0].name, backend=backend)
+
+    all_ms: list[float] = []
+    for path in files:
+        data = path.read_bytes()
+        times: list[float] = []
+        text = ""
+        for _ in range(repeat):
+            started = time.monotonic()
+            text = await speech.transcribe_voice(io.BytesIO(data), path.name, backend=backend)
+            times.append((time.monotonic() - started) * 1000)
+        all_ms.extend(times)
+        print(
+            f"[{backend}] {path.name:<30} {len(data) / 1024:7.1f} КБ  "
+            f"медиана {statistics.median(times):7.0f} мс  макс {max(times):7.0f} мс  «{text}»"
+        )
+    return all_ms
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("samples", type=Path, help="папка с .ogg-файлами")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backend", choices=(speech.OPENAI, speech.LOCAL), action="append")
+    args = parser.parse_args()
+
+    files = sorted(args.samples.glob("*.ogg"))
+    if not files:
+        parser.error(f"в {args.samples} нет .ogg-файлов")
+
+    summary = {}
+    try:
+        for backend in args.backend or (speech.OPENAI, speech.LOCAL):
+            if not _available(backend):
+                print(f"[{backend}] пропущен: " + (
+                    "не установлен faster-whisper" if backend == speech.LOCAL else "не задан ключ API"
+                ))
+                continue
+            summary[backend] = await _bench_backend(backend, files, max(args.repeat, 1))
+    finally:
+        speech.close_stt()
+        await close_llm_client()
+
+    print(f"\nФайлов: {len(files)}, повторов: {args.repeat}, локальная модель: "
+          f"{speech.STT_LOCAL_MODEL} ({speech.STT_LOCAL_COMPUTE_TYPE}), процессор: {os.cpu_count()} ядер")
+    for backend, ms in summary.items():
+        print(
+            f"{backend:<7} медиана {statistics.median(ms):7.0f} мс  "
+            f"p95 {_percentile(ms, 0.95):7.0f} мс  макс {max(ms):7.0f} мс"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""
+Замер задержки ответа на голосовое упражнение (handle_voice) с имитацией Telegram и LLM.
+
+    python bench_voice.py [--telegram-ms 80] [--stt-ms 350] [--llm-ms 600] [--db-ms 30] [--runs 5]
+
+Отправка сообщения, распознавание, проверка и запросы к БД заменены задержками; печатается
+медиана времени до вердикта и до показа следующего задания — и для сравнения сумма тех же
+шагов при строго последовательном выполнении.
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
+import argparse
+import asyncio
+import statistics
+import time
+from types import SimpleNamespace
+
+import bot.handlers.a2 as a2
+import bot.handlers.voice as voice
+
+NEXT_EXERCISE = "next exercise"
+
+
+class _FakeMessage:
+    def __init__(self, delay: float, log: list) -> None:
+        self.from_user = SimpleNamespace(id=1)
+        self.voice = SimpleNamespace(file_unique_id="bench")
+        self._delay = delay
+        self._log = log
+
+    async def answer(self, text: str, **kwargs) -> None:
+        await asyncio.sleep(self._delay)
+        self._log.append((time.monotonic(), text))
+
+    async def answer_dice(self, **kwargs) -> None:
+        await self.answer("🎲")
+
+
+class _FakeState:
+    async def get_state(self) -> str:
+        return "A2States:exercise"
+
+    async def get_data(self) -> dict:
+        return {"waiting_for_voice": True, "exercise_index": 0, "lesson_level": "A2"}
+
+    async def update_data(self, **kwargs) -> None:
+        await asyncio.sleep(0.005)
+
+
+def _patch(args: argparse.Namespace) -> None:
+    async def recognize_voice(bot, voice_note):
+        await asyncio.sleep(args.stt_ms / 1000)
+        return "hola"
+
+    async def check_voice_answer(expected, text):
+        await asyncio.sleep(args.llm_ms / 1000)
+        return True, "bien", ""
+
+    async def db_call(*a, **kw):
+        await asyncio.sleep(args.db_ms / 1000)
+        return SimpleNamespace()
+
+    async def check_achievements(user, metrics):
+        await asyncio.sleep(args.db_ms / 1000)
+        return [{"title": "bench", "desc": "bench"}]
+
+    async def show_exercise(message, state, exercise, index):
+        await message.answer(NEXT_EXERCISE)
+
+    voice.recognize_voice = recognize_voice
+    voice.check_voice_answer = check_voice_answer
+    voice.add_xp = db_call
+    voice.increment_voice_practice = db_call
+    voice.check_achievements = check_achievements
+    voice.resolve_lesson = lambda data: {"exercises": [{"type": "voice", "expected": "hola"}, {"type": "voice"}]}
+    a2._show_exercise = show_exercise
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--telegram-ms", type=float, default=80)
+    parser.add_argument("--stt-ms", type=float, default=350)
+    parser.add_argument("--llm-ms", type=float, default=600)
+    parser.add_argument("--db-ms", type=float, default=30)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    _patch(args)
+
+    verdicts, nexts = [], []
+    for _ in range(max(args.runs, 1)):
+        log: list = []
+        started = time.monotonic()
+        await voice.handle_voice(_FakeMessage(args.telegram_ms / 1000, log), None, _FakeState())
+        # Дать фоновому учёту XP и достижений доработать
+        await asyncio.sleep((args.telegram_ms * 2 + args.db_ms * 3) / 1000 + 0.1)
+        verdicts.append(next(t for t, text in log if text.startswith("✅")) - started)
+        nexts.append(next(t for t, text in log if text == NEXT_EXERCISE) - started)
+
+    tg, stt, llm, db = args.telegram_ms, args.stt_ms, args.llm_ms, args.db_ms
+    # Последовательно: «Обрабатываю», распознавание, «Я услышал», «Проверяю», проверка, вердикт,
+    # затем XP, счётчик, достижения (кубик + сообщение) и следующее задание
+    sequential_verdict = tg + stt + tg + tg + llm + tg
+    sequential_next = sequential_verdict + 3 * db + 2 * tg + tg
+    print(f"Вердикт:          {statistics.median(verdicts) * 1000:6.0f} мс (последовательно {sequential_verdict:.0f} мс)")
+    print(f"Следующее задание: {statistics.median(nexts) * 1000:6.0f} мс (последовательно {sequential_next:.0f} мс)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
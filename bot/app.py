@@ -0,0 +1,122 @@
+"""
+Сборка бота: конфигурация, роутеры, запуск опроса и остановка. Запускается из main.py.
+"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+import asyncio
+import logging
+from aiogram import Bot, Dispatcher
+from aiogram.enums import ParseMode
+from aiogram.client.default import DefaultBotProperties
+from aiogram.fsm.context import FSMContext
+from aiogram.filters import CommandStart
+from aiogram.types import Message
+
+from bot.states import OnboardingStates
+from bot.handlers import start, menu, onboarding, level_test, zero, a1, a2, b1, review, voice
+from bot.db.session import init_db
+from bot.db.fsm_storage import create_fsm_storage
+from bot.services.lessons import registry, watch_content
+from bot.services.llm import close_llm_client
+from bot.services.cache import cache_stats
+from bot.services.local_grader import grader_stats
+from bot.services.phonetics import phonetics_stats
+from bot.services.llm_dispatch import dispatch_stats
+from bot.services.prompts import prompt_stats
+from bot.services.speech import close_stt, preload_stt, voice_stats
+
+
+
+# ─────────────────────────────
+# Конфигурация
+# ─────────────────────────────
+
+BOT_TOKEN = os.getenv("BOT_TOKEN")
+if not BOT_TOKEN:
+    raise ValueError("BOT_TOKEN не найден. Проверь файл .env")
+
+# Период опроса файлов уроков/карточек для горячей перезагрузки (сек, 0 — выключено)
+CONTENT_RELOAD_INTERVAL = float(os.getenv("CONTENT_RELOAD_INTERVAL", "10"))
+
+
+
+# ─────────────────────────────
+# Логирование
+# ─────────────────────────────
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+)
+
+
+# ─────────────────────────────
+# Инициализация бота
+# ─────────────────────────────
+
+bot = Bot(
+    token=BOT_TOKEN,
+    default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+)
+
+dp = Dispatcher(storage=create_fsm_storage())
+dp.include_router(start.router)
+dp.include_router(onboarding.router)
+dp.include_router(level_test.router)
+dp.include_router(zero.router)
+dp.include_router(a2.router)
+dp.include_router(b1.router)
+dp.include_router(a1.router)
+dp.include_router(review.router)
+dp.include_router(voice.router)
+dp.include_router(menu.router)
+
+
+# ─────────────────────────────
+# Хендлеры
+# ─────────────────────────────
+
+# @dp.message(CommandStart())
+async def cmd_start(message: Message, state: FSMContext):
+    await message.answer(
+        """👋 Привет!
+Я твой AI-тренер по испанскому 🇪🇸
+
+Я помогу тебе:
+— выучить слова и фразы
+— практиковать язык каждый день
+— отслеживать прогресс
+
+Начнём с короткого теста?"""
+    )
+    await state.set_state(OnboardingStates.onboarding_info)
+
+
+# ─────────────────────────────
+# Точка входа
+# ─────────────────────────────
+
+async def main():
+    await init_db()
+    # Уроки читаются с диска до начала опроса, а не в первом хендлере
+    await asyncio.to_thread(registry.load)
+    await preload_stt()
+    reloader = None
+    if CONTENT_RELOAD_INTERVAL > 0:
+        reloader = asyncio.create_task(watch_content(CONTENT_RELOAD_INTERVAL))
+    try:
+        await dp.start_polling(bot)
+    finally:
+        if reloader:
+            reloader.cancel()
+        await close_llm_client()
+        close_stt()
+        logging.info("Статистика кэшей: %s", cache_stats())
+        logging.info("Локальная проверка ответов: %s", grader_stats())
+        logging.info("Фонетическая проверка голосовых: %s", phonetics_stats())
+        logging.info("Запросы к LLM: %s", dispatch_stats())
+        logging.info("Токены промптов: %s", prompt_stats())
+        logging.info("Голосовые: %s", voice_stats())
+
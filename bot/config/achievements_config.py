@@ -1,34 +1,52 @@
+# Достижения: metric — счётчик пользователя, threshold — порог, с которого достижение выдаётся.
+# Метрики: lessons (все пройденные уроки), streak, xp, words_learned, voice_practice_count.
 ACHIEVEMENTS = {
     "first_lesson": {
         "title": "Первый шаг",
         "desc": "Ты завершил(а) первый урок",
+        "metric": "lessons",
+        "threshold": 1,
     },
     "five_lessons": {
         "title": "Ученик",
         "desc": "Завершено 5 уроков",
+        "metric": "lessons",
+        "threshold": 5,
     },
     "streak3": {
         "title": "Настойчивость",
         "desc": "3 дня обучения подряд",
+        "metric": "streak",
+        "threshold": 3,
     },
     "streak7": {
         "title": "Неделя подряд",
         "desc": "7 дней обучения подряд",
+        "metric": "streak",
+        "threshold": 7,
     },
     "words20": {
         "title": "Словарный запас",
         "desc": "20 слов выучено",
+        "metric": "words_learned",
+        "threshold": 20,
     },
     "first_voice": {
         "title": "Первый голос",
         "desc": "Первая голосовая практика пройдена",
+        "metric": "voice_practice_count",
+        "threshold": 1,
     },
     "xp50": {
         "title": "Первые знания",
         "desc": "Набрано 50 баллов обучения",
+        "metric": "xp",
+        "threshold": 50,
     },
     "xp200": {
         "title": "Серьёзный настрой",
         "desc": "Набрано 200 баллов обучения",
+        "metric": "xp",
+        "threshold": 200,
     },
 }
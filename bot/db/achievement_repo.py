@@ -1,15 +1,57 @@
-from sqlalchemy import select
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.db.models import Achievement
 from bot.db.session import async_session_maker
 
+_UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": pg_insert}
+
 
 async def add_achievement(telegram_id: int, code: str) -> None:
+    await add_achievements(telegram_id, [code])
+
+
+async def add_achievements(telegram_id: int, codes: list[str]) -> list[str]:
+    """
+    Добавляет достижения одним INSERT ... ON CONFLICT DO NOTHING.
+    Возвращает коды, которые действительно были добавлены (без уже существующих).
+    """
+    if not codes:
+        return []
+    rows = [{"telegram_id": telegram_id, "code": code} for code in codes]
     async with async_session_maker() as session:
-        achievement = Achievement(telegram_id=telegram_id, code=code)
-        session.add(achievement)
+        dialect = session.bind.dialect
+        insert_fn = _UPSERT_INSERTS.get(dialect.name)
+        if insert_fn is None:
+            return await _add_one_by_one(session, rows)
+        stmt = insert_fn(Achievement).values(rows).on_conflict_do_nothing(
+            index_elements=[Achievement.telegram_id, Achievement.code]
+        )
+        if dialect.insert_returning:
+            result = await session.execute(stmt.returning(Achievement.code))
+            added = list(result.scalars().all())
+        else:
+            await session.execute(stmt)
+            added = list(codes)
         await session.commit()
+        return added
+
+
+async def _add_one_by_one(session: AsyncSession, rows: list[dict]) -> list[str]:
+    """Для диалектов без ON CONFLICT: вставка по одной, дубликаты пропускаются."""
+    added: list[str] = []
+    for row in rows:
+        try:
+            async with session.begin_nested():
+                await session.execute(insert(Achievement), row)
+        except IntegrityError:
+            continue
+        added.append(row["code"])
+    await session.commit()
+    return added
 
 
 async def has_achievement(telegram_id: int, code: str) -> bool:
@@ -0,0 +1,43 @@
+"""Репозиторий постоянного уровня кэша (cache_entries)."""
+from datetime import datetime
+
+from sqlalchemy import delete, select
+
+from bot.db.models import CacheEntry
+from bot.db.session import async_session_maker
+
+
+async def get_cache_entry(namespace: str, key: str) -> str | None:
+    """Значение (JSON) или None, если записи нет или срок истёк."""
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(CacheEntry.value, CacheEntry.expires_at).where(
+                CacheEntry.namespace == namespace,
+                CacheEntry.key == key,
+            )
+        )
+        row = result.one_or_none()
+    if row is None:
+        return None
+    value, expires_at = row
+    if expires_at is not None and expires_at <= datetime.utcnow():
+        return None
+    return value
+
+
+async def set_cache_entry(namespace: str, key: str, value: str, expires_at: datetime | None) -> None:
+    async with async_session_maker() as session:
+        await session.merge(
+            CacheEntry(namespace=namespace, key=key, value=value, expires_at=expires_at)
+        )
+        await session.commit()
+
+
+async def purge_expired_cache_entries() -> int:
+    """Удаляет просроченные записи. Возвращает количество удалённых."""
+    async with async_session_maker() as session:
+        result = await session.execute(
+            delete(CacheEntry).where(CacheEntry.expires_at <= datetime.utcnow())
+        )
+        await session.commit()
+        return result.rowcount or 0
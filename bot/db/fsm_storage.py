@@ -0,0 +1,164 @@
+"""
+Персистентное хранилище FSM для aiogram (замена MemoryStorage).
+
+Бэкенды (переменная FSM_STORAGE):
+- db (по умолчанию) — таблица fsm_storage в основной БД (bot.db) + горячий LRU в памяти,
+  запись пачками в фоне (FSM_FLUSH_INTERVAL_MS);
+- redis — RedisStorage aiogram (любой сервер с протоколом Redis, FSM_REDIS_URL),
+  общий для нескольких процессов бота;
+- memory — MemoryStorage (состояние теряется при перезапуске).
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Mapping
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import delete, insert, select
+
+from bot.db.models import FSMRecord
+from bot.db.session import async_session_maker
+
+try:
+    from aiogram.fsm.storage.redis import RedisStorage
+    HAS_REDIS = True
+except ImportError:
+    HAS_REDIS = False
+
+logger = logging.getLogger(__name__)
+
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+FSM_FLUSH_INTERVAL_MS = int(os.getenv("FSM_FLUSH_INTERVAL_MS", "200"))
+
+_EMPTY_DATA = "{}"
+
+
+def _build_key(key: StorageKey) -> str:
+    return f"{key.bot_id}:{key.chat_id}:{key.thread_id or ''}:{key.user_id}:{key.destiny}"
+
+
+class DatabaseStorage(BaseStorage):
+    """
+    FSM-хранилище поверх таблицы fsm_storage.
+    Чтение — из LRU-кэша (данные лежат в JSON, get_data = json.loads без похода в БД).
+    Запись — в кэш сразу, в БД — одной транзакцией раз в flush_interval.
+    """
+
+    def __init__(
+        self,
+        session_maker=async_session_maker,
+        cache_size: int = FSM_CACHE_SIZE,
+        flush_interval: float = FSM_FLUSH_INTERVAL_MS / 1000,
+    ) -> None:
+        self._session_maker = session_maker
+        self._cache_size = max(cache_size, 1)
+        self._flush_interval = flush_interval
+        # key -> (state, data_json)
+        self._cache: OrderedDict[str, tuple[str | None, str]] = OrderedDict()
+        self._pending: dict[str, tuple[str | None, str]] = {}
+        self._inflight: dict[str, tuple[str | None, str]] = {}
+        self._flush_task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+
+    async def _load(self, k: str) -> tuple[str | None, str]:
+        entry = self._cache.get(k)
+        if entry is not None:
+            self._cache.move_to_end(k)
+            return entry
+        entry = self._pending.get(k) or self._inflight.get(k)
+        if entry is None:
+            async with self._session_maker() as session:
+                result = await session.execute(
+                    select(FSMRecord.state, FSMRecord.data).where(FSMRecord.key == k)
+                )
+                row = result.one_or_none()
+            entry = (row[0], row[1] or _EMPTY_DATA) if row else (None, _EMPTY_DATA)
+        self._remember(k, entry)
+        return entry
+
+    def _remember(self, k: str, entry: tuple[str | None, str]) -> None:
+        self._cache[k] = entry
+        self._cache.move_to_end(k)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def _store(self, k: str, entry: tuple[str | None, str]) -> None:
+        self._remember(k, entry)
+        self._pending[k] = entry
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self._flush_interval)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Записывает накопленные изменения в БД одной транзакцией."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            self._inflight, self._pending = self._pending, {}
+            keys = list(self._inflight)
+            now = datetime.utcnow()
+            rows = [
+                {"key": k, "state": state, "data": data, "updated_at": now}
+                for k, (state, data) in self._inflight.items()
+                if state is not None or data != _EMPTY_DATA
+            ]
+            try:
+                async with self._session_maker() as session:
+                    await session.execute(delete(FSMRecord).where(FSMRecord.key.in_(keys)))
+                    if rows:
+                        await session.execute(insert(FSMRecord), rows)
+                    await session.commit()
+            except Exception as e:
+                logger.warning("FSM flush error (%d keys): %s", len(keys), e)
+                # Не теряем изменения: вернём в очередь, более новые записи не перетираем
+                for k, entry in self._inflight.items():
+                    self._pending.setdefault(k, entry)
+            finally:
+                self._inflight = {}
+        task = self._flush_task
+        if self._pending and (task is None or task.done() or task is asyncio.current_task()):
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k = _build_key(key)
+        _, data = await self._load(k)
+        self._store(k, (state.state if isinstance(state, State) else state, data))
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        state, _ = await self._load(_build_key(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        k = _build_key(key)
+        state, _ = await self._load(k)
+        self._store(k, (state, json.dumps(dict(data), ensure_ascii=False)))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, data = await self._load(_build_key(key))
+        return json.loads(data)
+
+    async def close(self) -> None:
+        await self.flush()
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+
+
+def create_fsm_storage() -> BaseStorage:
+    """Создаёт FSM-хранилище по FSM_STORAGE (db | redis | memory)."""
+    backend = os.getenv("FSM_STORAGE", "db").strip().lower()
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "redis":
+        url = os.getenv("FSM_REDIS_URL") or os.getenv("REDIS_URL") or "redis://localhost:6379/0"
+        if not HAS_REDIS:
+            raise ValueError("FSM_STORAGE=redis требует пакет redis: pip install redis")
+        return RedisStorage.from_url(url)
+    return DatabaseStorage()
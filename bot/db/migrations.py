@@ -0,0 +1,169 @@
+"""
+Версионированные миграции схемы БД.
+
+Применённые шаги записываются в таблицу schema_version (версия + контрольная сумма).
+При старте читается только эта таблица: если схема актуальна, больше запросов нет.
+Новая БД создаётся через create_all и сразу помечается последней версией.
+
+Новый шаг — новая запись в конце MIGRATIONS; уже применённые шаги не меняют
+(иначе не совпадёт контрольная сумма).
+"""
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import Connection, inspect, select, text
+from sqlalchemy.exc import DBAPIError
+
+from bot.db.base import Base
+from bot.db.models import CacheEntry, SchemaVersion
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    # (таблица, колонка, DDL-тип) — добавляются, только если колонки ещё нет
+    add_columns: tuple[tuple[str, str, str], ...] = ()
+    statements: tuple[str, ...] = ()
+    apply: Callable[[Connection], None] | None = None
+
+    @property
+    def checksum(self) -> str:
+        payload = repr((
+            self.version,
+            self.add_columns,
+            self.statements,
+            self.apply.__qualname__ if self.apply else None,
+        ))
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _ensure_achievement_unique_index(conn: Connection) -> None:
+    """Уникальный (telegram_id, code) для старых БД, созданных до UniqueConstraint."""
+    insp = inspect(conn)
+    wanted = ["telegram_id", "code"]
+    if any(c["column_names"] == wanted for c in insp.get_unique_constraints("achievements")):
+        return
+    if any(i["unique"] and i["column_names"] == wanted for i in insp.get_indexes("achievements")):
+        return
+    conn.execute(text(
+        "DELETE FROM achievements WHERE id NOT IN "
+        "(SELECT MIN(id) FROM achievements GROUP BY telegram_id, code)"
+    ))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_achievement_user_code ON achievements (telegram_id, code)"
+    ))
+
+
+def _create_cache_entries(conn: Connection) -> None:
+    CacheEntry.__table__.create(conn, checkfirst=True)
+
+
+MIGRATIONS: tuple[Migration, ...] = (
+    Migration(
+        version=1,
+        description="legacy columns for review_items and users",
+        add_columns=(
+            ("review_items", "content", "TEXT DEFAULT ''"),
+            ("review_items", "answer", "TEXT DEFAULT ''"),
+            ("review_items", "interval", "INTEGER DEFAULT 1"),
+            ("users", "last_level_test_at", "DATETIME"),
+            ("users", "zero_progress", "INTEGER DEFAULT 0"),
+            ("users", "a1_progress", "INTEGER DEFAULT 0"),
+            ("users", "streak", "INTEGER DEFAULT 0"),
+            ("users", "last_activity_date", "DATE"),
+            ("users", "xp", "INTEGER DEFAULT 0"),
+            ("users", "created_at", "DATETIME"),
+            ("users", "level_test_count", "INTEGER DEFAULT 0"),
+            ("users", "a2_progress", "INTEGER DEFAULT 0"),
+            ("users", "b1_progress", "INTEGER DEFAULT 0"),
+            ("users", "words_learned", "INTEGER DEFAULT 0"),
+            ("users", "voice_practice_count", "INTEGER DEFAULT 0"),
+        ),
+        statements=("UPDATE users SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL",),
+    ),
+    Migration(
+        version=2,
+        description="review_items (telegram_id, next_review_at) index",
+        statements=(
+            "CREATE INDEX IF NOT EXISTS ix_review_items_user_due "
+            "ON review_items (telegram_id, next_review_at)",
+        ),
+    ),
+    Migration(
+        version=3,
+        description="achievements (telegram_id, code) unique covering index",
+        apply=_ensure_achievement_unique_index,
+    ),
+    Migration(
+        version=4,
+        description="cache_entries table",
+        apply=_create_cache_entries,
+    ),
+)
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def read_applied(conn: Connection) -> dict[int, str] | None:
+    """{version: checksum} из schema_version; None — таблицы ещё нет."""
+    try:
+        rows = conn.execute(select(SchemaVersion.version, SchemaVersion.checksum)).all()
+    except DBAPIError:
+        return None
+    return {version: checksum for version, checksum in rows}
+
+
+def is_up_to_date(applied: dict[int, str] | None) -> bool:
+    if not applied or max(applied) < LATEST_VERSION:
+        return False
+    for m in MIGRATIONS:
+        if applied.get(m.version) != m.checksum:
+            logger.warning("Миграция %d: контрольная сумма не совпадает с записанной", m.version)
+    return True
+
+
+def _apply(conn: Connection, m: Migration) -> None:
+    if m.add_columns:
+        insp = inspect(conn)
+        existing: dict[str, set[str]] = {}
+        for table, column, ddl_type in m.add_columns:
+            if table not in existing:
+                existing[table] = {c["name"] for c in insp.get_columns(table)}
+            if column not in existing[table]:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+                existing[table].add(column)
+    for statement in m.statements:
+        conn.execute(text(statement))
+    if m.apply is not None:
+        m.apply(conn)
+
+
+def upgrade(conn: Connection) -> list[int]:
+    """Создаёт недостающие таблицы и применяет ожидающие шаги. Возвращает применённые версии."""
+    fresh = not inspect(conn).has_table("users")
+    Base.metadata.create_all(conn)
+    applied = read_applied(conn) or {}
+    done: list[int] = []
+    for m in MIGRATIONS:
+        if m.version in applied:
+            if applied[m.version] != m.checksum:
+                logger.warning("Миграция %d: контрольная сумма не совпадает с записанной", m.version)
+            continue
+        # В новой БД create_all уже создал актуальную схему — шаг только отмечаем
+        if not fresh:
+            _apply(conn, m)
+            logger.info("Миграция %d применена: %s", m.version, m.description)
+        conn.execute(SchemaVersion.__table__.insert().values(
+            version=m.version,
+            checksum=m.checksum,
+            description=m.description,
+            applied_at=datetime.utcnow(),
+        ))
+        done.append(m.version)
+    return done
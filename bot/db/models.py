@@ -1,6 +1,6 @@
 from datetime import date, datetime
 
-from sqlalchemy import UniqueConstraint, func
+from sqlalchemy import Index, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from bot.db.base import Base
@@ -9,6 +9,8 @@ from bot.db.base import Base
 class ReviewItem(Base):
     """Элемент для повторения ошибок (spaced repetition lite)."""
     __tablename__ = "review_items"
+    # Выборка/подсчёт «к повторению на сегодня»: WHERE telegram_id = ? AND next_review_at <= now
+    __table_args__ = (Index("ix_review_items_user_due", "telegram_id", "next_review_at"),)
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     telegram_id: Mapped[int] = mapped_column(index=True)
@@ -55,3 +57,39 @@ class User(Base):
         default=func.now(),
         server_default=func.now(),
     )
+
+
+class FSMRecord(Base):
+    """Состояние и данные FSM aiogram (персистентное хранилище вместо MemoryStorage)."""
+    __tablename__ = "fsm_storage"
+
+    key: Mapped[str] = mapped_column(primary_key=True)  # bot_id:chat_id:thread_id:user_id:destiny
+    state: Mapped[str | None] = mapped_column(nullable=True)
+    data: Mapped[str] = mapped_column(default="{}")  # JSON
+    updated_at: Mapped[datetime] = mapped_column(
+        default=func.now(),
+        server_default=func.now(),
+    )
+
+
+class SchemaVersion(Base):
+    """Применённые миграции схемы (bot/db/migrations.py)."""
+    __tablename__ = "schema_version"
+
+    version: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    checksum: Mapped[str] = mapped_column()
+    description: Mapped[str] = mapped_column(default="")
+    applied_at: Mapped[datetime] = mapped_column(
+        default=func.now(),
+        server_default=func.now(),
+    )
+
+
+class CacheEntry(Base):
+    """Постоянный уровень кэша (bot/services/cache.py): результаты проверок и т.п."""
+    __tablename__ = "cache_entries"
+
+    namespace: Mapped[str] = mapped_column(primary_key=True)
+    key: Mapped[str] = mapped_column(primary_key=True)  # sha1 от составного ключа
+    value: Mapped[str] = mapped_column()  # JSON
+    expires_at: Mapped[datetime | None] = mapped_column(nullable=True, index=True)
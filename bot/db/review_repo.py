@@ -1,7 +1,7 @@
 """Репозиторий для повторения ошибок (review_items)."""
 from datetime import datetime, timedelta
 
-from sqlalchemy import select, and_, delete
+from sqlalchemy import select, and_, delete, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.db.models import ReviewItem
@@ -38,12 +38,7 @@ async def get_due_reviews(telegram_id: int, limit: int | None = None) -> list[Re
     async with async_session_maker() as session:
         q = (
             select(ReviewItem)
-            .where(
-                and_(
-                    ReviewItem.telegram_id == telegram_id,
-                    ReviewItem.next_review_at <= now,
-                )
-            )
+            .where(_due_filter(telegram_id, now))
             .order_by(ReviewItem.next_review_at.asc())
         )
         if limit is not None:
@@ -52,6 +47,29 @@ async def get_due_reviews(telegram_id: int, limit: int | None = None) -> list[Re
         return list(result.scalars().all())
 
 
+def _due_filter(telegram_id: int, now: datetime):
+    return and_(
+        ReviewItem.telegram_id == telegram_id,
+        ReviewItem.next_review_at <= now,
+    )
+
+
+async def count_due_reviews(telegram_id: int, cap: int | None = None) -> int:
+    """
+    Количество ReviewItem к повторению (COUNT по индексу, без загрузки строк).
+    cap — считать не больше cap записей (достаточно, чтобы сравнить с лимитом).
+    """
+    now = datetime.utcnow()
+    async with async_session_maker() as session:
+        if cap is None:
+            q = select(func.count()).select_from(ReviewItem).where(_due_filter(telegram_id, now))
+        else:
+            due = select(ReviewItem.id).where(_due_filter(telegram_id, now)).limit(cap).subquery()
+            q = select(func.count()).select_from(due)
+        result = await session.execute(q)
+        return result.scalar_one()
+
+
 async def remove_review_item(item_id: int) -> None:
     """Удаляет запись по id."""
     async with async_session_maker() as session:
@@ -1,51 +1,45 @@
-import json
 from datetime import date, datetime, timedelta
-from pathlib import Path
 
-from sqlalchemy import select
+from sqlalchemy import case, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from bot.db.models import User
+from bot.db.models import Achievement, ReviewItem, User
 from bot.db.session import async_session_maker
-from bot.services.review import get_due_review_items
+from bot.services.lessons import registry
 
-DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
-ZERO_LESSONS_DIR = DATA_DIR / "zero_lessons"
-A1_LESSONS_DIR = DATA_DIR / "a1_lessons"
-A2_LESSONS_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "a2_lessons"
-B1_LESSONS_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "b1_lessons"
 
-
-def _has_b1_lesson_file(progress: int) -> bool:
-    """Проверяет, есть ли файл урока b1_{progress+1:02d}.json."""
-    lesson_num = progress + 1
-    for prefix in ("b1", "б1"):
-        if (B1_LESSONS_DIR / f"{prefix}_{lesson_num:02d}.json").exists():
-            return True
-    return False
-
-
-def _has_a2_lesson_file(progress: int) -> bool:
-    """Проверяет, есть ли файл урока a2_{progress+1:02d}.json."""
-    lesson_num = progress + 1
-    for prefix in ("a2", "а2"):
-        if (A2_LESSONS_DIR / f"{prefix}_{lesson_num:02d}.json").exists():
-            return True
-    return False
+async def get_user_by_telegram_id(telegram_id: int, session: AsyncSession) -> User | None:
+    result = await session.execute(select(User).where(User.telegram_id == telegram_id))
+    return result.scalar_one_or_none()
 
 
-def _has_a1_lesson_file(progress: int) -> bool:
-    """Проверяет, есть ли файл урока a1_{progress+1:02d}.json."""
-    lesson_num = progress + 1
-    for prefix in ("a1", "а1"):
-        if (A1_LESSONS_DIR / f"{prefix}_{lesson_num:02d}.json").exists():
-            return True
-    return False
+def _streak_values(today: date) -> dict:
+    """streak +1, если последняя активность была вчера; 1 — если раньше; без изменений — если сегодня."""
+    return {
+        "streak": case(
+            (User.last_activity_date == today, func.coalesce(User.streak, 0)),
+            (User.last_activity_date == today - timedelta(days=1), func.coalesce(User.streak, 0) + 1),
+            else_=1,
+        ),
+        "last_activity_date": today,
+    }
 
 
-async def get_user_by_telegram_id(telegram_id: int, session: AsyncSession) -> User | None:
-    result = await session.execute(select(User).where(User.telegram_id == telegram_id))
-    return result.scalar_one_or_none()
+async def _update_user(telegram_id: int, **values) -> User | None:
+    """
+    Один атомарный UPDATE users ... WHERE telegram_id = ? RETURNING *.
+    Возвращает пользователя после изменения (None — пользователя нет).
+    """
+    stmt = update(User).where(User.telegram_id == telegram_id).values(**values)
+    async with async_session_maker() as session:
+        if session.bind.dialect.update_returning:
+            result = await session.execute(stmt.returning(User))
+            user = result.scalar_one_or_none()
+        else:
+            await session.execute(stmt)
+            user = await get_user_by_telegram_id(telegram_id, session)
+        await session.commit()
+        return user
 
 
 async def update_user_level(
@@ -54,115 +48,80 @@ async def update_user_level(
     last_level_test_at: datetime | None = None,
     increment_test_count: bool = False,
 ) -> None:
-    async with async_session_maker() as session:
-        result = await session.execute(select(User).where(User.telegram_id == telegram_id))
-        user = result.scalar_one_or_none()
-        if user:
-            user.level = level
-            if last_level_test_at is not None:
-                user.last_level_test_at = last_level_test_at
-            if increment_test_count:
-                user.level_test_count = (getattr(user, "level_test_count", 0) or 0) + 1
-            await session.commit()
+    values: dict = {"level": level}
+    if last_level_test_at is not None:
+        values["last_level_test_at"] = last_level_test_at
+    if increment_test_count:
+        values["level_test_count"] = func.coalesce(User.level_test_count, 0) + 1
+    await _update_user(telegram_id, **values)
 
 
 async def update_zero_progress(telegram_id: int, progress: int) -> None:
-    async with async_session_maker() as session:
-        result = await session.execute(select(User).where(User.telegram_id == telegram_id))
-        user = result.scalar_one_or_none()
-        if user:
-            user.zero_progress = progress
-            await session.commit()
+    await _update_user(telegram_id, zero_progress=progress)
 
 
 async def update_a1_progress(telegram_id: int, progress: int) -> None:
-    async with async_session_maker() as session:
-        result = await session.execute(select(User).where(User.telegram_id == telegram_id))
-        user = result.scalar_one_or_none()
-        if user:
-            user.a1_progress = progress
-            await session.commit()
+    await _update_user(telegram_id, a1_progress=progress)
 
 
 async def update_a2_progress(telegram_id: int, progress: int) -> None:
-    async with async_session_maker() as session:
-        result = await session.execute(select(User).where(User.telegram_id == telegram_id))
-        user = result.scalar_one_or_none()
-        if user:
-            user.a2_progress = progress
-            await session.commit()
+    await _update_user(telegram_id, a2_progress=progress)
 
 
 async def update_b1_progress(telegram_id: int, progress: int) -> None:
-    async with async_session_maker() as session:
-        result = await session.execute(select(User).where(User.telegram_id == telegram_id))
-        user = result.scalar_one_or_none()
-        if user:
-            user.b1_progress = progress
-            await session.commit()
+    await _update_user(telegram_id, b1_progress=progress)
 
 
-async def add_xp(telegram_id: int, amount: int) -> None:
+async def add_xp(telegram_id: int, amount: int) -> User | None:
     """Начисляет XP пользователю."""
-    async with async_session_maker() as session:
-        result = await session.execute(select(User).where(User.telegram_id == telegram_id))
-        user = result.scalar_one_or_none()
-        if user:
-            user.xp = (getattr(user, "xp", 0) or 0) + amount
-            await session.commit()
+    return await _update_user(telegram_id, xp=func.coalesce(User.xp, 0) + amount)
 
 
-async def increment_words_learned(telegram_id: int, amount: int = 1) -> None:
+async def increment_words_learned(telegram_id: int, amount: int = 1) -> User | None:
     """Увеличивает счётчик выученных слов (при завершении урока или освоении карточки в повторениях)."""
-    async with async_session_maker() as session:
-        result = await session.execute(select(User).where(User.telegram_id == telegram_id))
-        user = result.scalar_one_or_none()
-        if user:
-            user.words_learned = (getattr(user, "words_learned", 0) or 0) + amount
-            await session.commit()
+    return await _update_user(
+        telegram_id, words_learned=func.coalesce(User.words_learned, 0) + amount
+    )
 
 
-async def increment_voice_practice(telegram_id: int) -> None:
+async def increment_voice_practice(telegram_id: int) -> User | None:
     """Увеличивает счётчик голосовых практик."""
-    async with async_session_maker() as session:
-        result = await session.execute(select(User).where(User.telegram_id == telegram_id))
-        user = result.scalar_one_or_none()
-        if user:
-            user.voice_practice_count = (getattr(user, "voice_practice_count", 0) or 0) + 1
-            await session.commit()
+    return await _update_user(
+        telegram_id, voice_practice_count=func.coalesce(User.voice_practice_count, 0) + 1
+    )
 
 
-async def update_user_activity(telegram_id: int) -> None:
+async def update_user_activity(telegram_id: int) -> User | None:
     """Обновляет streak (дни подряд) и last_activity_date после активности."""
-    today = date.today()
-    async with async_session_maker() as session:
-        result = await session.execute(select(User).where(User.telegram_id == telegram_id))
-        user = result.scalar_one_or_none()
-        if not user:
-            return
-        last = getattr(user, "last_activity_date", None)
-        if last is not None:
-            last = last.date() if hasattr(last, "date") else last
-        if last == today:
-            return
-        if last == today - timedelta(days=1):
-            user.streak = (getattr(user, "streak", 0) or 0) + 1
-        else:
-            user.streak = 1
-        user.last_activity_date = today
-        await session.commit()
+    return await _update_user(telegram_id, **_streak_values(date.today()))
 
 
-def _load_zero_lesson_ids() -> list[str]:
-    """Динамически загружает список lesson_id из папки zero_lessons (zero_01, zero_02, ...)."""
-    if not ZERO_LESSONS_DIR.exists():
-        return []
-    files = sorted(ZERO_LESSONS_DIR.glob("zero_*.json"))
-    return [f.stem for f in files]
+_PROGRESS_COLUMNS = {
+    "ZERO": "zero_progress",
+    "A1": "a1_progress",
+    "A2": "a2_progress",
+    "B1": "b1_progress",
+}
 
 
-# Номера ZERO-уроков (zero_progress = кол-во завершённых). Загружается из файлов при старте.
-ZERO_LESSON_IDS = _load_zero_lesson_ids()
+async def record_lesson_completion(
+    telegram_id: int,
+    level: str,
+    lesson_num: int,
+    words: int = 0,
+    xp: int = 0,
+) -> User | None:
+    """
+    Завершение урока одним UPDATE: прогресс уровня, выученные слова, XP и streak.
+    Возвращает обновлённого пользователя (для проверки достижений и клавиатуры).
+    """
+    values = {
+        _PROGRESS_COLUMNS[level]: lesson_num,
+        "words_learned": func.coalesce(User.words_learned, 0) + words,
+        "xp": func.coalesce(User.xp, 0) + xp,
+        **_streak_values(date.today()),
+    }
+    return await _update_user(telegram_id, **values)
 
 
 async def is_current_level_completed(user) -> bool:
@@ -172,24 +131,25 @@ async def is_current_level_completed(user) -> bool:
     """
     if not user:
         return False
+    catalog = registry.catalog
     zero_progress = getattr(user, "zero_progress", 0) or 0
     a1_progress = getattr(user, "a1_progress", 0) or 0
 
     # Путь ZERO: A1 без теста, проходим ZERO
     if user.level == "A1" and user.last_level_test_at is None:
-        return zero_progress >= len(ZERO_LESSON_IDS)
+        return zero_progress >= catalog.total("ZERO")
 
     # Путь A1: ZERO завершён или тест пройден
     if user.level == "A1":
-        return not _has_a1_lesson_file(a1_progress)
+        return a1_progress >= catalog.total("A1")
 
     a2_progress = getattr(user, "a2_progress", 0) or 0
     if user.level == "A2":
-        return not _has_a2_lesson_file(a2_progress)
+        return a2_progress >= catalog.total("A2")
 
     b1_progress = getattr(user, "b1_progress", 0) or 0
     if user.level == "B1":
-        return not _has_b1_lesson_file(b1_progress)
+        return b1_progress >= catalog.total("B1")
 
     return False
 
@@ -198,22 +158,23 @@ def has_unfinished_progress(user: User | None) -> bool:
     """Проверяет, есть ли незавершённый прогресс на любом уровне."""
     if not user:
         return False
+    catalog = registry.catalog
     zero_progress = getattr(user, "zero_progress", 0) or 0
     a1_progress = getattr(user, "a1_progress", 0) or 0
 
     if user.level == "A1":
         if user.last_level_test_at is None:
-            if zero_progress < len(ZERO_LESSON_IDS):
+            if zero_progress < catalog.total("ZERO"):
                 return True
-        if _has_a1_lesson_file(a1_progress):
+        if a1_progress < catalog.total("A1"):
             return True
     a2_progress = getattr(user, "a2_progress", 0) or 0
     if user.level == "A2":
-        if _has_a2_lesson_file(a2_progress):
+        if a2_progress < catalog.total("A2"):
             return True
     b1_progress = getattr(user, "b1_progress", 0) or 0
     if user.level == "B1":
-        if _has_b1_lesson_file(b1_progress):
+        if b1_progress < catalog.total("B1"):
             return True
     return False
 
@@ -221,48 +182,11 @@ def has_unfinished_progress(user: User | None) -> bool:
 def _estimate_words_from_progress(zero: int, a1: int, a2: int, b1: int) -> int:
     """Оценивает кол-во выученных слов по прогрессу (для backfill)."""
     total = 0
-    for i in range(1, zero + 1):
-        path = ZERO_LESSONS_DIR / f"zero_{i:02d}.json"
-        if path.exists():
-            try:
-                with open(path, encoding="utf-8") as f:
-                    data = json.load(f)
-                total += len(data.get("cards", []))
-            except Exception:
-                pass
-    for i in range(1, a1 + 1):
-        for prefix in ("a1", "а1"):
-            path = A1_LESSONS_DIR / f"{prefix}_{i:02d}.json"
-            if path.exists():
-                try:
-                    with open(path, encoding="utf-8") as f:
-                        data = json.load(f)
-                    total += len(data.get("cards", []))
-                except Exception:
-                    pass
-                break
-    for i in range(1, a2 + 1):
-        for prefix in ("a2", "а2"):
-            path = A2_LESSONS_DIR / f"{prefix}_{i:02d}.json"
-            if path.exists():
-                try:
-                    with open(path, encoding="utf-8") as f:
-                        data = json.load(f)
-                    total += len(data.get("cards", []))
-                except Exception:
-                    pass
-                break
-    for i in range(1, b1 + 1):
-        for prefix in ("b1", "б1"):
-            path = B1_LESSONS_DIR / f"{prefix}_{i:02d}.json"
-            if path.exists():
-                try:
-                    with open(path, encoding="utf-8") as f:
-                        data = json.load(f)
-                    total += len(data.get("cards", []))
-                except Exception:
-                    pass
-                break
+    for level, progress in (("ZERO", zero), ("A1", a1), ("A2", a2), ("B1", b1)):
+        for i in range(1, progress + 1):
+            lesson = registry.get(level, i)
+            if lesson:
+                total += len(lesson.get("cards", []))
     return total
 
 
@@ -271,28 +195,38 @@ async def get_user_stats(
     name: str | None = None,
 ) -> dict | None:
     """
-    Возвращает статистику пользователя для отображения в профиле.
+    Возвращает статистику пользователя для профиля и экрана статистики.
     name — имя из Telegram (передаётся вызывающим).
+    Пользователь, число карточек к повторению и коды достижений читаются одним запросом:
+    строка users + скалярный COUNT по review_items + LEFT JOIN achievements.
     """
+    now = datetime.utcnow()
+    due_count = (
+        select(func.count(ReviewItem.id))
+        .where(
+            ReviewItem.telegram_id == User.telegram_id,
+            ReviewItem.next_review_at <= now,
+        )
+        .correlate(User)
+        .scalar_subquery()
+    )
     async with async_session_maker() as session:
-        result = await session.execute(select(User).where(User.telegram_id == telegram_id))
-        user = result.scalar_one_or_none()
-    if not user:
+        result = await session.execute(
+            select(User, due_count, Achievement.code)
+            .outerjoin(Achievement, Achievement.telegram_id == User.telegram_id)
+            .where(User.telegram_id == telegram_id)
+            .order_by(Achievement.id)
+        )
+        rows = result.all()
+    if not rows:
         return None
+    user, count_due_reviews = rows[0][0], rows[0][1] or 0
+    achievements = [code for _, _, code in rows if code is not None]
 
-    created_at = getattr(user, "created_at", None)
-    if created_at is None:
-        async with async_session_maker() as session:
-            result = await session.execute(select(User).where(User.telegram_id == telegram_id))
-            u = result.scalar_one_or_none()
-            if u:
-                u.created_at = datetime.utcnow()
-                await session.commit()
-        created_at = datetime.utcnow()
-
-    due_items = await get_due_review_items(telegram_id)
-    count_due_reviews = len(due_items)
-
+    # Редкие дозаполнения старых записей: created_at и words_learned — одним UPDATE
+    backfill: dict = {}
+    if getattr(user, "created_at", None) is None:
+        backfill["created_at"] = now
     words_learned = getattr(user, "words_learned", 0) or 0
     zero_p = getattr(user, "zero_progress", 0) or 0
     a1_p = getattr(user, "a1_progress", 0) or 0
@@ -302,25 +236,30 @@ async def get_user_stats(
     if words_learned == 0 and (zero_p > 0 or a1_p > 0 or a2_p > 0 or b1_p > 0):
         estimated = _estimate_words_from_progress(zero_p, a1_p, a2_p, b1_p)
         if estimated > 0:
-            async with async_session_maker() as s:
-                r = await s.execute(select(User).where(User.telegram_id == telegram_id))
-                u = r.scalar_one_or_none()
-                if u:
-                    u.words_learned = estimated
-                    await s.commit()
-            words_learned = estimated
+            backfill["words_learned"] = estimated
+    if backfill:
+        async with async_session_maker() as session:
+            await session.execute(
+                update(User).where(User.telegram_id == telegram_id).values(**backfill)
+            )
+            await session.commit()
+        for field, value in backfill.items():
+            setattr(user, field, value)
+        words_learned = user.words_learned or 0
 
     return {
+        "user": user,
         "name": name or "Ученик",
         "level": getattr(user, "level", None),
         "xp": getattr(user, "xp", 0) or 0,
         "streak": getattr(user, "streak", 0) or 0,
-        "created_at": created_at,
-        "zero_progress": getattr(user, "zero_progress", 0) or 0,
-        "a1_progress": getattr(user, "a1_progress", 0) or 0,
-        "a2_progress": getattr(user, "a2_progress", 0) or 0,
-        "b1_progress": getattr(user, "b1_progress", 0) or 0,
+        "created_at": user.created_at,
+        "zero_progress": zero_p,
+        "a1_progress": a1_p,
+        "a2_progress": a2_p,
+        "b1_progress": b1_p,
         "count_due_reviews": count_due_reviews,
+        "achievements": achievements,
         "words_learned": words_learned,
         "level_test_count": getattr(user, "level_test_count", 0) or 0,
         "last_level_test_at": getattr(user, "last_level_test_at", None),
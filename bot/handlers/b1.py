@@ -2,8 +2,7 @@
 Обработчик B1-уроков.
 Поток: welcome (первый раз) → title → theory → cards → exercises → success.
 """
-import json
-from pathlib import Path
+from typing import Mapping
 
 from aiogram import Router, F
 from aiogram.types import (
@@ -18,17 +17,17 @@ from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 
 from bot.states import B1States
-from bot.db.user_repo import get_user_by_telegram_id, update_b1_progress, update_user_activity, add_xp, increment_words_learned
+from bot.db.user_repo import get_user_by_telegram_id, record_lesson_completion
 from bot.db.session import async_session
 from bot.keyboards.main_menu import main_menu_keyboard
-from bot.services.llm import check_fill_text, evaluate_dialogue
-from bot.services.review import add_mistake, get_due_review_items
-from bot.services.achievements_service import check_achievements
+from bot.services.llm import check_fill_text
+from bot.handlers.feedback import answer_dialogue_feedback
+from bot.services.review import add_mistake, count_due_review_items
+from bot.services.achievements_service import check_achievements, LESSON_METRICS
+from bot.services.lessons import registry, lesson_ref, resolve_lesson
 
 router = Router()
 
-B1_LESSONS_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "b1_lessons"
-
 B1_WELCOME = (
     "Привет, {name}! 🇪🇸\n\n"
     "<b>Добро пожаловать на уровень B1!</b>\n\n"
@@ -67,20 +66,8 @@ def _b1_complete_keyboard() -> InlineKeyboardMarkup:
     ])
 
 
-def _get_lesson_path(lesson_num: int) -> Path | None:
-    for prefix in ("b1", "б1"):
-        path = B1_LESSONS_DIR / f"{prefix}_{lesson_num:02d}.json"
-        if path.exists():
-            return path
-    return None
-
-
-def _load_lesson(lesson_num: int) -> dict | None:
-    path = _get_lesson_path(lesson_num)
-    if not path:
-        return None
-    with open(path, encoding="utf-8") as f:
-        return json.load(f)
+def _load_lesson(lesson_num: int) -> Mapping | None:
+    return registry.get("B1", lesson_num)
 
 
 def _normalize_spanish_for_match(s: str) -> str:
@@ -112,23 +99,7 @@ def _extract_russian_from_question(question: str) -> str | None:
 
 
 def _has_b1_lesson(progress: int) -> bool:
-    return _get_lesson_path(progress + 1) is not None
-
-
-def _get_total_b1_lessons() -> int:
-    if not B1_LESSONS_DIR.exists():
-        return 0
-    count = 0
-    for f in B1_LESSONS_DIR.iterdir():
-        if f.suffix == ".json":
-            stem = f.stem
-            if stem.startswith("b1_") or stem.startswith("б1_"):
-                try:
-                    int(stem.split("_")[-1])
-                    count += 1
-                except (ValueError, IndexError):
-                    pass
-    return count
+    return registry.exists("B1", progress + 1)
 
 
 def _card_keyboard() -> ReplyKeyboardMarkup:
@@ -189,16 +160,11 @@ async def _start_b1_lesson(message: Message, state: FSMContext, lesson_num: int)
         return False
 
     cards = lesson.get("cards", [])
-    exercises = lesson.get("exercises", [])
 
     await state.update_data(
-        lesson_num=lesson_num,
-        lesson=lesson,
-        cards=cards,
+        **lesson_ref("B1", lesson_num),
         card_index=0,
-        exercises=exercises,
         exercise_index=0,
-        lesson_level="B1",
     )
 
     title = lesson.get("title", f"Урок B1-{lesson_num}")
@@ -224,7 +190,7 @@ async def _start_b1_lesson(message: Message, state: FSMContext, lesson_num: int)
 
 async def _go_to_exercises_or_complete(message: Message, state: FSMContext):
     data = await state.get_data()
-    exercises = data.get("exercises", [])
+    exercises = resolve_lesson(data).get("exercises", [])
     if exercises:
         await _start_exercises(message, state)
     else:
@@ -233,7 +199,7 @@ async def _go_to_exercises_or_complete(message: Message, state: FSMContext):
 
 async def _start_exercises(message: Message, state: FSMContext):
     data = await state.get_data()
-    exercises = data.get("exercises", [])
+    exercises = resolve_lesson(data).get("exercises", [])
     if not exercises:
         await _complete_b1_lesson(message, state)
         return
@@ -247,7 +213,7 @@ def _exercise_reply_keyboard() -> ReplyKeyboardMarkup:
 
 
 async def _show_exercise(message: Message, state: FSMContext, ex: dict, idx: int):
-    total = len((await state.get_data()).get("exercises", []))
+    total = len(resolve_lesson(await state.get_data()).get("exercises", []))
     await state.set_state(B1States.exercise)
     question = ex.get("question") or ex.get("prompt", "")
 
@@ -276,26 +242,21 @@ async def _show_exercise(message: Message, state: FSMContext, ex: dict, idx: int
 async def _complete_b1_lesson(message: Message, state: FSMContext):
     data = await state.get_data()
     lesson_num = data.get("lesson_num", 1)
-    lesson = data.get("lesson", {})
+    lesson = resolve_lesson(data)
     success_msg = lesson.get("success_message", "✅ Урок завершён!")
     cards_count = len(lesson.get("cards", []))
 
-    await update_b1_progress(message.from_user.id, lesson_num)
-    if cards_count > 0:
-        await increment_words_learned(message.from_user.id, cards_count)
-    await update_user_activity(message.from_user.id)
-    await add_xp(message.from_user.id, 10)
+    user = await record_lesson_completion(
+        message.from_user.id, "B1", lesson_num, words=cards_count, xp=10
+    )
     await state.clear()
 
-    async with async_session() as session:
-        user = await get_user_by_telegram_id(message.from_user.id, session)
-
-        new_achievements = await check_achievements(user)
-        for ach in new_achievements:
-            await message.answer_dice(emoji="🎲")
-            await message.answer(
-                f"🏆 Новое достижение!\n\n<b>{ach['title']}</b>\n{ach['desc']}"
-            )
+    new_achievements = await check_achievements(user, metrics=LESSON_METRICS)
+    for ach in new_achievements:
+        await message.answer_dice(emoji="🎲")
+        await message.answer(
+            f"🏆 Новое достижение!\n\n<b>{ach['title']}</b>\n{ach['desc']}"
+        )
 
     if _has_b1_lesson(lesson_num):
         await message.answer(
@@ -320,8 +281,7 @@ async def start_b1_for_user(event: Message | CallbackQuery, state: FSMContext, a
     if not user or user.level != "B1":
         return False
 
-    due_items = await get_due_review_items(user_id)
-    count = len(due_items)
+    count = await count_due_review_items(user_id)
     if count > 0:
         from bot.handlers.review import start_review
         await msg.answer(f"📚 Сначала повторим прошлые ошибки. Сегодня к повторению: {count}. ")
@@ -331,7 +291,7 @@ async def start_b1_for_user(event: Message | CallbackQuery, state: FSMContext, a
         await msg.answer("📚 Сегодня повторений нет — можно идти дальше!")
 
     b1_progress = getattr(user, "b1_progress", 0)
-    total_lessons = _get_total_b1_lessons()
+    total_lessons = registry.catalog.total("B1")
     if total_lessons > 0 and b1_progress >= total_lessons:
         await state.clear()
         await msg.answer(B1_COMPLETE_MESSAGE, reply_markup=_b1_complete_keyboard())
@@ -362,8 +322,7 @@ async def start_b1_for_user(event: Message | CallbackQuery, state: FSMContext, a
 
 @router.message(B1States.welcome, F.text == "Поехали!")
 async def b1_welcome_start(message: Message, state: FSMContext):
-    due_items = await get_due_review_items(message.from_user.id)
-    count = len(due_items)
+    count = await count_due_review_items(message.from_user.id)
     if count > 0:
         from bot.handlers.review import start_review
         await message.answer(f"📚 Сегодня к повторению: {count}. Сначала повторим прошлые ошибки")
@@ -392,7 +351,7 @@ async def b1_finish(message: Message, state: FSMContext):
 @router.message(B1States.card, F.text == "➡️ Далее")
 async def b1_next_card(message: Message, state: FSMContext):
     data = await state.get_data()
-    cards = data["cards"]
+    cards = resolve_lesson(data).get("cards", [])
     card_index = data["card_index"] + 1
 
     if card_index >= len(cards):
@@ -409,7 +368,7 @@ async def b1_next_card(message: Message, state: FSMContext):
 @router.message(B1States.theory, F.text == "➡️ К карточкам")
 async def b1_theory_to_cards(message: Message, state: FSMContext):
     data = await state.get_data()
-    cards = data.get("cards", [])
+    cards = resolve_lesson(data).get("cards", [])
     if cards:
         await state.update_data(card_index=0)
         await state.set_state(B1States.card)
@@ -431,14 +390,14 @@ async def b1_exercise_choice(callback: CallbackQuery, state: FSMContext):
     chosen_idx = int(parts[2])
 
     data = await state.get_data()
-    exercises = data["exercises"]
+    lesson = resolve_lesson(data)
+    exercises = lesson.get("exercises", [])
     lesson_num = data.get("lesson_num", 1)
     ex = exercises[ex_idx]
     correct = chosen_idx == ex["correct_index"]
     correct_opt = ex["options"][ex["correct_index"]]
 
     if not correct:
-        lesson = data.get("lesson", {})
         cards = lesson.get("cards", [])
         question = ex.get("question", "")
         answer_ru = _find_russian_for_spanish(correct_opt, cards) or _extract_russian_from_question(question) or correct_opt
@@ -468,7 +427,7 @@ async def b1_exercise_choice(callback: CallbackQuery, state: FSMContext):
 @router.message(B1States.exercise, F.text == "Пропустить")
 async def b1_exercise_skip(message: Message, state: FSMContext):
     data = await state.get_data()
-    exercises = data["exercises"]
+    exercises = resolve_lesson(data).get("exercises", [])
     ex_idx = data.get("exercise_index", 0) + 1
 
     await message.answer("⏭ Пропущено.")
@@ -484,14 +443,15 @@ async def b1_exercise_skip(message: Message, state: FSMContext):
 @router.message(B1States.exercise, F.text)
 async def b1_exercise_text(message: Message, state: FSMContext):
     data = await state.get_data()
-    exercises = data["exercises"]
+    lesson = resolve_lesson(data)
+    exercises = lesson.get("exercises", [])
     lesson_num = data.get("lesson_num", 1)
     ex_idx = data.get("exercise_index", 0)
     ex = exercises[ex_idx]
 
     if ex["type"] == "fill_text":
         await message.answer("Проверяю твой ответ…")
-        correct, feedback = await check_fill_text(message.text, ex.get("answer", ""))
+        correct, feedback = await check_fill_text(message.text, ex.get("answer", ""), ex.get("accepted", ()))
         await message.answer(feedback)
         if not correct:
             expected = ex.get("answer", "")
@@ -509,12 +469,9 @@ async def b1_exercise_text(message: Message, state: FSMContext):
                 answer=answer_ru,
             )
     elif ex["type"] == "dialogue":
-        await message.answer("Проверяю твой ответ…")
-        lesson = data.get("lesson", {})
         theory = lesson.get("theory", "")
-        feedback = await evaluate_dialogue(message.text, ex.get("prompt", ""), theory=theory)
-        await message.answer(feedback)
-        if feedback.strip().startswith("❌"):
+        correct = await answer_dialogue_feedback(message, message.text, ex.get("prompt", ""), theory=theory)
+        if not correct:
             content = ex.get("review_content", "")
             answer_ru = ex.get("review_answer", "")
             if not content or not answer_ru:
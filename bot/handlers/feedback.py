@@ -0,0 +1,46 @@
+"""
+Показ проверки dialogue по мере генерации: одно сообщение «Проверяю твой ответ…»
+правится по мере поступления feedback (не чаще DIALOGUE_EDIT_INTERVAL сек),
+в конце — итоговый разбор.
+"""
+import logging
+import os
+import time
+
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import Message
+
+from bot.services.llm import evaluate_dialogue_stream
+
+logger = logging.getLogger(__name__)
+
+# Telegram ограничивает частоту правок; первая часть показывается сразу
+DIALOGUE_EDIT_INTERVAL = float(os.getenv("DIALOGUE_EDIT_INTERVAL", "1.0"))
+
+
+async def _edit(status: Message, text: str) -> bool:
+    try:
+        await status.edit_text(text)
+        return True
+    except TelegramAPIError as e:
+        logger.debug("Правка сообщения с проверкой: %s", e)
+        return False
+
+
+async def answer_dialogue_feedback(message: Message, user_text: str, prompt: str, theory: str = "") -> bool:
+    """Проверяет ответ dialogue, показывая feedback по мере генерации. True — ответ верный."""
+    status = await message.answer("Проверяю твой ответ…")
+    last_edit = 0.0
+
+    async def on_partial(text: str) -> None:
+        nonlocal last_edit
+        now = time.monotonic()
+        if now - last_edit < DIALOGUE_EDIT_INTERVAL:
+            return
+        last_edit = now
+        await _edit(status, f"{text} …")
+
+    correct, feedback = await evaluate_dialogue_stream(user_text, prompt, theory=theory, on_partial=on_partial)
+    if not await _edit(status, feedback):
+        await message.answer(feedback)
+    return correct
@@ -79,8 +79,9 @@ async def handle_answer(callback: CallbackQuery, state: FSMContext):
     selected_idx = int(parts[2])
 
     data = await state.get_data()
+    # Ключи — строки: данные FSM сериализуются в JSON
     answers: dict = data.get("answers", {})
-    if q_id in answers:
+    if str(q_id) in answers:
         await callback.answer()
         return
 
@@ -90,7 +91,7 @@ async def handle_answer(callback: CallbackQuery, state: FSMContext):
         return
 
     is_correct = selected_idx == question["correct"]
-    answers[q_id] = is_correct
+    answers[str(q_id)] = is_correct
     current_index = data.get("current_index", 0)
 
     await state.update_data(answers=answers)
@@ -99,7 +100,7 @@ async def handle_answer(callback: CallbackQuery, state: FSMContext):
     next_index = current_index + 1
 
     if next_index >= len(QUESTIONS):
-        level = calculate_level(answers)
+        level = calculate_level({int(k): v for k, v in answers.items()})
         await update_user_level(
             callback.from_user.id,
             level,
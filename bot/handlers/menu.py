@@ -1,54 +1,24 @@
 from datetime import date
-from pathlib import Path
 
 from aiogram import Router, F
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
 from bot.db.session import async_session
-from bot.db.user_repo import get_user_by_telegram_id, get_user_stats, has_unfinished_progress, ZERO_LESSON_IDS
+from bot.db.user_repo import get_user_by_telegram_id, get_user_stats, has_unfinished_progress
 from bot.config.achievements_config import ACHIEVEMENTS
-from bot.db.achievement_repo import get_user_achievements
 from bot.handlers.zero import start_zero_lesson, _get_current_lesson_id
 from bot.handlers.a1 import start_a1_for_user
 from bot.handlers.a2 import start_a2_for_user
 from bot.handlers.b1 import start_b1_for_user
 from bot.handlers.review import start_review
-from bot.services.review import get_due_review_items
+from bot.services.review import count_due_review_items
+from bot.services.lessons import registry
 from bot.keyboards.main_menu import main_menu_keyboard
 from bot.utils import format_date, get_test_availability_text, progress_bar, get_display_name
 
 router = Router()
 
-DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
-ZERO_LESSONS_DIR = DATA_DIR / "zero_lessons"
-A1_LESSONS_DIR = DATA_DIR / "a1_lessons"
-A2_LESSONS_DIR = DATA_DIR / "a2_lessons"
-B1_LESSONS_DIR = DATA_DIR / "b1_lessons"
-
-
-def _get_zero_lesson_count() -> int:
-    """Количество уроков ZERO (zero_*.json)."""
-    if not ZERO_LESSONS_DIR.exists():
-        return 0
-    return len(list(ZERO_LESSONS_DIR.glob("zero_*.json")))
-
-
-def _get_a1_lesson_count() -> int:
-    """Количество уроков A1 (a1_*.json / а1_*.json)."""
-    if not A1_LESSONS_DIR.exists():
-        return 0
-    count = len(list(A1_LESSONS_DIR.glob("a1_*.json")))
-    if count == 0:
-        count = len(list(A1_LESSONS_DIR.glob("а1_*.json")))
-    return count
-
-
-def _get_lesson_count(lesson_dir: Path, pattern: str) -> int:
-    if not lesson_dir.exists():
-        return 0
-    return len(list(lesson_dir.glob(pattern)))
-
 
 @router.message(F.text == "Продолжить обучение")
 async def resume(message: Message, state: FSMContext, from_review_complete: bool = False):
@@ -63,8 +33,7 @@ async def resume(message: Message, state: FSMContext, from_review_complete: bool
         return
 
     # Сначала повторение ошибок перед уроком
-    due_items = await get_due_review_items(message.from_user.id)
-    count = len(due_items)
+    count = await count_due_review_items(message.from_user.id)
     zero_progress = getattr(user, "zero_progress", 0) or 0
     a1_progress = getattr(user, "a1_progress", 0) or 0
     has_any_lesson_progress = zero_progress > 0 or a1_progress > 0
@@ -78,7 +47,7 @@ async def resume(message: Message, state: FSMContext, from_review_complete: bool
         await message.answer("📚 Сегодня повторений нет — можно идти дальше!")
 
     # ZERO (A1 без теста, ZERO не завершён)
-    if user.level == "A1" and user.last_level_test_at is None and zero_progress < len(ZERO_LESSON_IDS):
+    if user.level == "A1" and user.last_level_test_at is None and zero_progress < registry.catalog.total("ZERO"):
         lesson_id = _get_current_lesson_id(zero_progress)
         if lesson_id and await start_zero_lesson(message, state, lesson_id, show_header=True):
             return
@@ -121,10 +90,11 @@ async def profile(message: Message):
     level_test_count = stats.get("level_test_count", 0) or 0
     last_level_test_at = stats.get("last_level_test_at")
 
-    zero_total = _get_zero_lesson_count()
-    a1_total = _get_a1_lesson_count()
-    a2_total = _get_lesson_count(A2_LESSONS_DIR, "a2_*.json") or _get_lesson_count(A2_LESSONS_DIR, "а2_*.json")
-    b1_total = _get_lesson_count(B1_LESSONS_DIR, "b1_*.json") or _get_lesson_count(B1_LESSONS_DIR, "б1_*.json")
+    catalog = registry.catalog
+    zero_total = catalog.total("ZERO")
+    a1_total = catalog.total("A1")
+    a2_total = catalog.total("A2")
+    b1_total = catalog.total("B1")
 
     z, a1, a2, b1 = stats["zero_progress"], stats["a1_progress"], stats.get("a2_progress", 0), stats.get("b1_progress", 0)
     level_lines = []
@@ -171,47 +141,41 @@ async def profile(message: Message):
 
     text = "\n".join(lines)
 
-    async with async_session() as session:
-        user = await get_user_by_telegram_id(message.from_user.id, session)
-    await message.answer(text, reply_markup=main_menu_keyboard(user))
+    await message.answer(text, reply_markup=main_menu_keyboard(stats["user"]))
 
 
 
 @router.message(lambda msg: msg.text == "📊 Статистика")
 async def stats(message: Message):
-    async with async_session() as session:
-        user = await get_user_by_telegram_id(message.from_user.id, session)
+    user_stats = await get_user_stats(message.from_user.id)
 
-    if user is None:
+    if user_stats is None:
         await message.answer("Сначала нажми /start")
         return
+    user = user_stats["user"]
+    achievements_list = user_stats["achievements"]
 
     # Синхронизация: начислить достижения, которые могли быть пропущены (напр. при переходе через 200 баллов)
     from bot.services.achievements_service import check_achievements
-    await check_achievements(user)
+    new_achievements = await check_achievements(user, unlocked=achievements_list)
+    achievements_list = achievements_list + [a["code"] for a in new_achievements]
 
-    zero_total = _get_zero_lesson_count()
-    a1_total = _get_a1_lesson_count()
-    a2_total = _get_lesson_count(A2_LESSONS_DIR, "a2_*.json")
-    if a2_total == 0:
-        a2_total = _get_lesson_count(A2_LESSONS_DIR, "а2_*.json")
-    b1_total = _get_lesson_count(B1_LESSONS_DIR, "b1_*.json")
-    if b1_total == 0:
-        b1_total = _get_lesson_count(B1_LESSONS_DIR, "б1_*.json")
-
-    zero_progress = getattr(user, "zero_progress", 0) or 0
-    a1_progress = getattr(user, "a1_progress", 0) or 0
-    a2_progress = getattr(user, "a2_progress", 0) or 0
-    b1_progress = getattr(user, "b1_progress", 0) or 0
+    catalog = registry.catalog
+    zero_total = catalog.total("ZERO")
+    a1_total = catalog.total("A1")
+    a2_total = catalog.total("A2")
+    b1_total = catalog.total("B1")
 
-    review_items = await get_due_review_items(message.from_user.id)
-    review_count = len(review_items)
+    zero_progress = user_stats["zero_progress"]
+    a1_progress = user_stats["a1_progress"]
+    a2_progress = user_stats["a2_progress"]
+    b1_progress = user_stats["b1_progress"]
+    review_count = user_stats["count_due_reviews"]
 
     level = user.level or "определяется"
 
-    xp = getattr(user, "xp", 0) or 0
-    streak = getattr(user, "streak", 0) or 0
-    achievements_list = await get_user_achievements(message.from_user.id)
+    xp = user_stats["xp"]
+    streak = user_stats["streak"]
     achievements_count = len(achievements_list)
     achievement_titles = [
         ACHIEVEMENTS.get(code, {}).get("title", code) for code in achievements_list
@@ -13,10 +13,10 @@ from bot.db.user_repo import (
     get_or_create_user,
     get_user_by_telegram_id,
     is_current_level_completed,
-    ZERO_LESSON_IDS,
 )
 from bot.db.session import async_session
 from bot.keyboards.main_menu import main_menu_keyboard
+from bot.services.lessons import registry
 
 router = Router()
 
@@ -67,7 +67,7 @@ async def path_zero(message: Message, state: FSMContext):
         user = await get_user_by_telegram_id(message.from_user.id, session)
     progress = getattr(user, "zero_progress", 0) or 0
     # zero_progress = кол-во завершённых уроков; все уроки = ZERO завершён
-    if progress >= len(ZERO_LESSON_IDS):
+    if progress >= registry.catalog.total("ZERO"):
         await state.clear()
         await message.answer(
             "Ты уже прошёл(а) базовый уровень. Продолжай обучение в меню.",
@@ -8,12 +8,15 @@ from aiogram.fsm.context import FSMContext
 from bot.states import ReviewStates
 from bot.db.session import async_session
 from bot.db.user_repo import get_user_by_telegram_id, update_user_activity, add_xp
-from bot.services.achievements_service import check_achievements
+from bot.services.achievements_service import check_achievements, REVIEW_METRICS
 from bot.services.review import (
+    collect_pending_checks,
+    count_due_review_items,
+    forget_pending_checks,
     get_due_review_items,
+    prefetch_translation_check,
     process_review_answer,
     is_answer_correct,
-    is_translation_semantically_correct,
 )
 
 REVIEW_LIMIT = 7
@@ -44,6 +47,7 @@ async def start_review(message: Message, state: FSMContext, continue_after_lesso
     reviews = await get_due_review_items(message.from_user.id, limit=REVIEW_LIMIT)
     if not reviews:
         return False
+    forget_pending_checks(message.from_user.id)
 
     total = len(reviews)
     await state.update_data(
@@ -68,8 +72,7 @@ async def start_review(message: Message, state: FSMContext, continue_after_lesso
 @router.message(F.text == "📚 Повторить ошибки")
 async def review_entry(message: Message, state: FSMContext):
     """Вход по кнопке «Повторить ошибки»."""
-    due_items = await get_due_review_items(message.from_user.id)
-    count = len(due_items)
+    count = await count_due_review_items(message.from_user.id)
     if count == 0:
         async with async_session() as session:
             user = await get_user_by_telegram_id(message.from_user.id, session)
@@ -89,6 +92,7 @@ async def review_finish(message: Message, state: FSMContext):
     data = await state.get_data()
     continue_lesson = data.get("review_continue_lesson", False)
     await state.clear()
+    forget_pending_checks(message.from_user.id)
 
     if continue_lesson:
         from bot.handlers.menu import resume
@@ -108,20 +112,30 @@ async def _finish_review_and_continue(message: Message, state: FSMContext):
     data = await state.get_data()
     continue_lesson = data.get("review_continue_lesson", False)
     reviews_count = data.get("review_total", len(data.get("review_items", [])))
+
+    # Итоги проверок по смыслу, запущенных в фоне во время сессии
+    checked = await collect_pending_checks(message.from_user.id)
+    if checked:
+        lines = ["🔎 Проверка ответов по смыслу:"]
+        for r in checked:
+            if r["correct"]:
+                lines.append(f"✅ {r['content']} — «{r['answer']}» засчитано")
+            else:
+                lines.append(f"❌ {r['content']} — правильно: <b>{r['expected']}</b>")
+        await message.answer("\n".join(lines))
+
     await update_user_activity(message.from_user.id)
-    await add_xp(message.from_user.id, reviews_count * 5)
+    user = await add_xp(message.from_user.id, reviews_count * 5)
     await state.clear()
 
-    remaining = await get_due_review_items(message.from_user.id)
-    if len(remaining) > REVIEW_LIMIT:
+    remaining = await count_due_review_items(message.from_user.id, cap=REVIEW_LIMIT + 1)
+    if remaining > REVIEW_LIMIT:
         await message.answer(
             "📚 Сегодня повторим только часть карточек (7), чтобы не перегружать тебя.\n"
             "Остальные повторим позже 🙂"
         )
 
-    async with async_session() as session:
-        user = await get_user_by_telegram_id(message.from_user.id, session)
-    new_achievements = await check_achievements(user)
+    new_achievements = await check_achievements(user, metrics=REVIEW_METRICS)
     for ach in new_achievements:
         await message.answer_dice(emoji="🎲")
         await message.answer(
@@ -158,20 +172,20 @@ async def review_answer(message: Message, state: FSMContext):
 
     correct = is_answer_correct(user_answer, expected) if expected else True
     if not correct and expected and content_es:
-        await message.answer("Проверяю ответ…")
-        correct = await is_translation_semantically_correct(user_answer, expected, content_es)
-
-    if correct:
-        feedback = "✅ Верно!"
+        # Синоним или перефраз: проверяем по смыслу в фоне, итог — в конце сессии
+        prefetch_translation_check(message.from_user.id, current["id"], user_answer, expected, content_es)
+        await message.answer(
+            f"🔎 Ответ отличается от эталона: <b>{expected}</b>\n"
+            "Проверю по смыслу — итог в конце повторения."
+        )
     else:
-        feedback = f"❌ Неверно\nПравильный ответ: <b>{expected}</b>"
-
-    await message.answer(feedback)
+        feedback = "✅ Верно!" if correct else f"❌ Неверно\nПравильный ответ: <b>{expected}</b>"
+        await message.answer(feedback)
 
-    from bot.db.review_repo import get_review_item_by_id
-    review_item = await get_review_item_by_id(current["id"])
-    if review_item:
-        await process_review_answer(review_item, correct)
+        from bot.db.review_repo import get_review_item_by_id
+        review_item = await get_review_item_by_id(current["id"])
+        if review_item:
+            await process_review_answer(review_item, correct)
 
     index += 1
     if index >= len(items):
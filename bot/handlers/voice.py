@@ -5,32 +5,67 @@
 - Упражнение choice: «Выбери ответ, нажав на кнопку»
 - Вне урока: «🎙 Я услышал: {text}»
 """
+import asyncio
 import logging
-import os
 
 from aiogram import Router, Bot, F
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
-from bot.services.speech import transcribe_voice
-from bot.services.llm import check_voice_answer, check_fill_text, evaluate_dialogue
+from bot.services.speech import recognize_voice
+from bot.services.llm import check_voice_answer, check_fill_text
+from bot.handlers.feedback import answer_dialogue_feedback
 from bot.services.review import add_mistake
-from bot.services.achievements_service import check_achievements
-from bot.db.user_repo import add_xp, increment_voice_practice, get_user_by_telegram_id
-from bot.db.session import async_session
+from bot.services.achievements_service import check_achievements, VOICE_METRICS
+from bot.db.user_repo import add_xp, increment_voice_practice
 from bot.handlers.a1 import _extract_russian_from_question
+from bot.services.lessons import resolve_lesson
 
 router = Router()
 logger = logging.getLogger(__name__)
 
 
+# Эталон для dialogue/open: готовой фразы нет, ответ оценивает только LLM
+_OPEN_ANSWER = "любая допустимая фраза (проверка будет от LLM)"
+
+# Сильные ссылки на фоновые задачи, пока они не завершатся
+_background: set[asyncio.Task] = set()
+
+
+def _run_in_background(coro) -> None:
+    task = asyncio.get_running_loop().create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def _answer_in_order(message: Message, *texts: str) -> None:
+    for text in texts:
+        await message.answer(text)
+
+
+async def _record_voice_practice(message: Message) -> None:
+    """XP и счётчик голосовых практик, новые достижения."""
+    try:
+        await add_xp(message.from_user.id, 20)
+        user = await increment_voice_practice(message.from_user.id)
+        new_achievements = await check_achievements(user, metrics=VOICE_METRICS)
+        for ach in new_achievements:
+            await message.answer_dice(emoji="🎲")
+            await message.answer(
+                f"🏆 Новое достижение!\n\n<b>{ach['title']}</b>\n{ach['desc']}"
+            )
+    except Exception as e:
+        logger.exception("Учёт голосовой практики: %s", e)
+
+
 async def _process_voice_as_text_answer(message: Message, state: FSMContext, text: str) -> bool:
     """
     Обрабатывает распознанный текст как ответ на fill_text/dialogue.
     Возвращает True, если обработано.
     """
     data = await state.get_data()
-    exercises = data.get("exercises", [])
+    lesson = resolve_lesson(data)
+    exercises = lesson.get("exercises", [])
     if not exercises:
         return False
 
@@ -50,8 +85,10 @@ async def _process_voice_as_text_answer(message: Message, state: FSMContext, tex
     prefix = "a1" if level == "A1" else "a2"
 
     if ex_type == "fill_text":
-        await message.answer("Проверяю твой ответ…")
-        correct, feedback = await check_fill_text(text, ex.get("answer", ""))
+        _, (correct, feedback) = await asyncio.gather(
+            message.answer("Проверяю твой ответ…"),
+            check_fill_text(text, ex.get("answer", ""), ex.get("accepted", ())),
+        )
         await message.answer(feedback)
         if not correct:
             expected = ex.get("answer", "")
@@ -69,12 +106,9 @@ async def _process_voice_as_text_answer(message: Message, state: FSMContext, tex
                 answer=answer_ru,
             )
     else:  # dialogue
-        await message.answer("Проверяю твой ответ…")
-        lesson = data.get("lesson", {})
         theory = lesson.get("theory", "")
-        feedback = await evaluate_dialogue(text, ex.get("prompt", ""), theory=theory)
-        await message.answer(feedback)
-        if feedback.strip().startswith("❌"):
+        correct = await answer_dialogue_feedback(message, text, ex.get("prompt", ""), theory=theory)
+        if not correct:
             content = ex.get("review_content", "")
             answer_ru = ex.get("review_answer", "")
             if not content or not answer_ru:
@@ -127,14 +161,12 @@ async def handle_voice(message: Message, bot: Bot, state: FSMContext):
         await message.answer("Голосовой ввод не требуется, напиши свой ответ.")
         return
 
-    os.makedirs("tmp", exist_ok=True)
-    file = await bot.get_file(message.voice.file_id)
-    path = f"tmp/{message.voice.file_id}.ogg"
-
     try:
-        await bot.download_file(file.file_path, path)
-        await message.answer("🎙 Обрабатываю голосовое сообщение…")
-        text = await transcribe_voice(path)
+        # Статус уходит, пока голосовое скачивается и распознаётся
+        _, text = await asyncio.gather(
+            message.answer("🎙 Обрабатываю голосовое сообщение…"),
+            recognize_voice(bot, message.voice),
+        )
 
         if not text:
             await message.answer("Не удалось распознать речь. Попробуй записать ещё раз.")
@@ -144,7 +176,7 @@ async def handle_voice(message: Message, bot: Bot, state: FSMContext):
         in_lesson = "exercise" in state_key and ("A1States" in state_key or "A2States" in state_key or "B1States" in state_key)
 
         # Текущее упражнение — voice, fill_text или dialogue?
-        exercises = data.get("exercises", [])
+        exercises = resolve_lesson(data).get("exercises", [])
         ex_idx = data.get("exercise_index", 0)
         current_ex = exercises[ex_idx] if ex_idx < len(exercises) else {}
         ex_type = current_ex.get("type", "")
@@ -155,36 +187,28 @@ async def handle_voice(message: Message, bot: Bot, state: FSMContext):
         if ex_type == "fill_text":
             expected_for_check = current_ex.get("answer", "")
         elif ex_type in ("dialogue", "open"):
-            expected_for_check = "любая допустимая фраза (проверка будет от LLM)"
+            expected_for_check = _OPEN_ANSWER
         else:
             expected_for_check = expected_voice
 
         # Voice-упражнение ИЛИ fill_text/dialogue, на которые ответили голосом — проверяем как voice
         if waiting or (in_lesson and is_voice_exercise and expected_voice) or (in_lesson and is_text_exercise_with_voice and expected_for_check):
             # Голосовое упражнение или fill_text/dialogue, на которые ответили голосом
-            await message.answer(f"🎙 Я услышал:\n{text}")
             expected = data.get("lesson_voice_expected") or expected_voice or expected_for_check
-            await message.answer("Проверяю произношение…")
-            correct, feedback_ru, corrected = await check_voice_answer(expected, text)
+            # Модель проверяет ответ, пока уходят «Я услышал» и «Проверяю…» (по порядку)
+            _, (correct, feedback_ru, corrected) = await asyncio.gather(
+                _answer_in_order(message, f"🎙 Я услышал:\n{text}", "Проверяю произношение…"),
+                check_voice_answer(expected, text, open_answer=expected == _OPEN_ANSWER),
+            )
             if correct:
-                await message.answer(f"✅ Верно!\n{feedback_ru}")
+                verdict = f"✅ Верно!\n{feedback_ru}"
             else:
-                msg = f"❌ Почти правильно\n\n{feedback_ru}\n\n👉 Правильно: {corrected}"
-                await message.answer(msg)
-            await state.update_data(waiting_for_voice=False)
-
-            await add_xp(message.from_user.id, 20)
-            await increment_voice_practice(message.from_user.id)
-            async with async_session() as session:
-                user = await get_user_by_telegram_id(message.from_user.id, session)
-            new_achievements = await check_achievements(user)
-            for ach in new_achievements:
-                await message.answer_dice(emoji="🎲")
-                await message.answer(
-                    f"🏆 Новое достижение!\n\n<b>{ach['title']}</b>\n{ach['desc']}"
-                )
-
-            exercises = data.get("exercises", [])
+                verdict = f"❌ Почти правильно\n\n{feedback_ru}\n\n👉 Правильно: {corrected}"
+            await asyncio.gather(message.answer(verdict), state.update_data(waiting_for_voice=False))
+
+            # XP, счётчик и достижения — после вердикта, не задерживая следующее задание
+            _run_in_background(_record_voice_practice(message))
+
             ex_idx = data.get("exercise_index", 0) + 1
             level = data.get("lesson_level", "A2")
 
@@ -220,6 +244,3 @@ async def handle_voice(message: Message, bot: Bot, state: FSMContext):
     except Exception as e:
         logger.exception("Voice error: %s", e)
         await message.answer("Не удалось распознать речь. Попробуй записать ещё раз.")
-    finally:
-        if os.path.exists(path):
-            os.remove(path)
@@ -1,6 +1,5 @@
-import json
 from datetime import datetime, timedelta
-from pathlib import Path
+from typing import Mapping
 
 from aiogram import Router, F
 from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton
@@ -11,21 +10,16 @@ from bot.states import ZeroStates, OnboardingStates
 from bot.db.user_repo import (
     get_user_by_telegram_id,
     is_current_level_completed,
-    update_zero_progress,
-    update_user_activity,
-    add_xp,
-    increment_words_learned,
-    ZERO_LESSON_IDS,
+    record_lesson_completion,
 )
 from bot.db.session import async_session
 from bot.keyboards.main_menu import main_menu_keyboard
 from bot.services.review import add_mistake
-from bot.services.achievements_service import check_achievements
+from bot.services.achievements_service import check_achievements, LESSON_METRICS
+from bot.services.lessons import registry, lesson_ref, resolve_lesson
 
 router = Router()
 
-ZERO_LESSONS_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "zero_lessons"
-
 # Поздравление после прохождения всех уроков ZERO
 ZERO_COMPLETE_MESSAGE = (
     "Поздравляю! 🎉 Ты завершил(а) базовый модуль испанского языка — "
@@ -61,18 +55,24 @@ ZERO_WELCOME = (
 )
 
 
-def _load_lesson(lesson_id: str) -> dict | None:
-    path = ZERO_LESSONS_DIR / f"{lesson_id}.json"
-    if not path.exists():
-        return None
-    with open(path, encoding="utf-8") as f:
-        return json.load(f)
+def _lesson_num(lesson_id: str) -> int:
+    """zero_07 → 7."""
+    return int(lesson_id.rsplit("_", 1)[-1])
+
+
+def _load_lesson(lesson_id: str) -> Mapping | None:
+    return registry.get("ZERO", _lesson_num(lesson_id))
+
+
+def _sorted_cards(lesson: Mapping) -> list[Mapping]:
+    return sorted(lesson.get("cards", []), key=lambda c: c.get("order", 0))
 
 
 def _get_current_lesson_id(progress: int) -> str | None:
     """Возвращает lesson_id для текущего урока по progress (0 = первый урок)."""
-    if progress < len(ZERO_LESSON_IDS):
-        return ZERO_LESSON_IDS[progress]
+    lesson_ids = registry.lesson_ids("ZERO")
+    if progress < len(lesson_ids):
+        return lesson_ids[progress]
     return None
 
 
@@ -84,16 +84,15 @@ async def start_zero_lesson(message: Message, state: FSMContext, lesson_id: str,
     lesson = _load_lesson(lesson_id)
     if not lesson or not lesson.get("cards"):
         return False
-    cards = sorted(lesson["cards"], key=lambda c: c.get("order", 0))
+    cards = _sorted_cards(lesson)
     await state.update_data(
         lesson_id=lesson_id,
-        lesson=lesson,
-        cards=cards,
+        **lesson_ref("ZERO", _lesson_num(lesson_id)),
         card_index=0,
     )
     await state.set_state(ZeroStates.card)
 
-    lesson_num = ZERO_LESSON_IDS.index(lesson_id) + 1
+    lesson_num = _lesson_num(lesson_id)
     title = lesson.get("title", f"Урок {lesson_num}")
     description = lesson.get("description", "")
 
@@ -173,11 +172,10 @@ async def zero_start(message: Message, state: FSMContext):
         await message.answer("Урок не найден.", reply_markup=main_menu_keyboard(user))
         return
 
-    cards = sorted(lesson["cards"], key=lambda c: c.get("order", 0))
+    cards = _sorted_cards(lesson)
     await state.update_data(
         lesson_id=lesson_id,
-        lesson=lesson,
-        cards=cards,
+        **lesson_ref("ZERO", _lesson_num(lesson_id)),
         card_index=0,
     )
     await state.set_state(ZeroStates.card)
@@ -209,24 +207,23 @@ async def zero_finish(message: Message, state: FSMContext):
 )
 async def zero_next_card(message: Message, state: FSMContext):
     data = await state.get_data()
-    cards = data["cards"]
+    lesson = resolve_lesson(data)
+    cards = _sorted_cards(lesson)
     card_index = data["card_index"] + 1
 
     if card_index >= len(cards):
         # Переход к quiz
-        lesson = data["lesson"]
         quiz = lesson.get("quiz", {})
         questions = quiz.get("questions", [])
 
         if not questions:
             # Нет quiz — сразу завершаем урок
-            await _complete_lesson(message, state, data["lesson_id"])
+            await _complete_lesson(message, state, data)
             return
 
         await state.update_data(
             card_index=card_index,
             quiz_index=0,
-            quiz_questions=questions,
         )
         await state.set_state(ZeroStates.quiz)
 
@@ -248,11 +245,11 @@ async def zero_next_card(message: Message, state: FSMContext):
 @router.message(StateFilter(ZeroStates.quiz), F.text)
 async def zero_quiz_answer(message: Message, state: FSMContext):
     data = await state.get_data()
-    questions = data["quiz_questions"]
+    questions = resolve_lesson(data).get("quiz", {}).get("questions", [])
     quiz_index = data.get("quiz_index", 0)
 
     if quiz_index >= len(questions):
-        await _complete_lesson(message, state, data["lesson_id"])
+        await _complete_lesson(message, state, data)
         return
 
     q = questions[quiz_index]
@@ -276,7 +273,7 @@ async def zero_quiz_answer(message: Message, state: FSMContext):
 
     if next_index >= len(questions):
         await message.answer(feedback)
-        await _complete_lesson(message, state, data["lesson_id"])
+        await _complete_lesson(message, state, data)
         return
 
     await state.update_data(quiz_index=next_index)
@@ -287,30 +284,26 @@ async def zero_quiz_answer(message: Message, state: FSMContext):
     )
 
 
-async def _complete_lesson(message: Message, state: FSMContext, lesson_id: str):
-    lesson = _load_lesson(lesson_id)
+async def _complete_lesson(message: Message, state: FSMContext, data: dict):
+    # Урок — по ссылке из FSM: файл мог измениться или исчезнуть после перезагрузки
+    lesson = resolve_lesson(data)
     success_msg = lesson.get("success_message", "✅ Урок завершён!")
-    progress = ZERO_LESSON_IDS.index(lesson_id) + 1
+    progress = data.get("lesson_num") or _lesson_num(data["lesson_id"])
     cards_count = len(lesson.get("cards", []))
 
-    await update_zero_progress(message.from_user.id, progress)
-    if cards_count > 0:
-        await increment_words_learned(message.from_user.id, cards_count)
-    await update_user_activity(message.from_user.id)
-    await add_xp(message.from_user.id, 10)
+    user = await record_lesson_completion(
+        message.from_user.id, "ZERO", progress, words=cards_count, xp=10
+    )
     await state.clear()
 
-    async with async_session() as session:
-        user = await get_user_by_telegram_id(message.from_user.id, session)
-
-    new_achievements = await check_achievements(user)
+    new_achievements = await check_achievements(user, metrics=LESSON_METRICS)
     for ach in new_achievements:
         await message.answer_dice(emoji="🎲")
         await message.answer(
             f"🏆 Новое достижение!\n\n<b>{ach['title']}</b>\n{ach['desc']}"
         )
 
-    if progress >= len(ZERO_LESSON_IDS):
+    if progress >= registry.catalog.total("ZERO"):
         await state.set_state(ZeroStates.zero_complete)
         await message.answer(
             f"{success_msg}\n\n{ZERO_COMPLETE_MESSAGE}",
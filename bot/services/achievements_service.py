@@ -1,47 +1,149 @@
+"""
+Выдача достижений по правилам из bot/config/achievements_config.py.
+
+Каждое достижение — порог по одной метрике пользователя. Правила сгруппированы
+по метрике и отсортированы по порогу; для каждого пользователя хранится курсор
+«следующий недостигнутый порог» по каждой метрике, поэтому проверка после события
+смотрит только изменившиеся метрики и только пороги, которые стали достижимы.
+"""
+import os
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+
 from bot.config.achievements_config import ACHIEVEMENTS
-from bot.db.achievement_repo import add_achievement, has_achievement
+from bot.db.achievement_repo import add_achievements, get_user_achievements
+
+ACHIEVEMENTS_CACHE_SIZE = int(os.getenv("ACHIEVEMENTS_CACHE_SIZE", "10000"))
+
+METRICS: dict[str, Callable[[object], int]] = {
+    "lessons": lambda user: (
+        (getattr(user, "zero_progress", 0) or 0)
+        + (getattr(user, "a1_progress", 0) or 0)
+        + (getattr(user, "a2_progress", 0) or 0)
+        + (getattr(user, "b1_progress", 0) or 0)
+    ),
+    "streak": lambda user: getattr(user, "streak", 0) or 0,
+    "xp": lambda user: getattr(user, "xp", 0) or 0,
+    "words_learned": lambda user: getattr(user, "words_learned", 0) or 0,
+    "voice_practice_count": lambda user: getattr(user, "voice_practice_count", 0) or 0,
+}
+
+# Какие метрики меняет событие (для check_achievements(user, metrics=...))
+LESSON_METRICS = ("lessons", "words_learned", "xp", "streak")
+REVIEW_METRICS = ("words_learned", "xp", "streak")
+VOICE_METRICS = ("voice_practice_count", "xp")
+
+
+def _index_rules(config: dict) -> dict[str, tuple[tuple[int, str], ...]]:
+    """metric -> ((threshold, code), ...) по возрастанию порога."""
+    by_metric: dict[str, list[tuple[int, str]]] = {}
+    for code, cfg in config.items():
+        metric = cfg.get("metric")
+        if metric not in METRICS:
+            raise ValueError(f"Достижение {code}: неизвестная метрика {metric!r}")
+        by_metric.setdefault(metric, []).append((int(cfg["threshold"]), code))
+    return {metric: tuple(sorted(rules)) for metric, rules in by_metric.items()}
+
+
+RULES_BY_METRIC = _index_rules(ACHIEVEMENTS)
+
+
+@dataclass
+class _UserAchievements:
+    unlocked: set[str]
+    # metric -> индекс первого неполученного правила в RULES_BY_METRIC[metric]
+    cursors: dict[str, int] = field(default_factory=dict)
+
+    def cursor(self, metric: str) -> int:
+        pos = self.cursors.get(metric)
+        if pos is None:
+            pos = 0
+            rules = RULES_BY_METRIC[metric]
+            while pos < len(rules) and rules[pos][1] in self.unlocked:
+                pos += 1
+            self.cursors[metric] = pos
+        return pos
+
 
+# telegram_id -> полученные достижения и курсоры (LRU). Достижения не удаляются,
+# поэтому кэш только дополняется при вставке; устаревание безопасно — вставка идемпотентна.
+_cache: OrderedDict[int, _UserAchievements] = OrderedDict()
 
-async def check_achievements(user) -> list[dict]:
+
+def _remember(telegram_id: int, codes: Iterable[str]) -> _UserAchievements:
+    state = _cache.get(telegram_id)
+    if state is None:
+        state = _UserAchievements(unlocked=set(codes))
+        _cache[telegram_id] = state
+        while len(_cache) > ACHIEVEMENTS_CACHE_SIZE:
+            _cache.popitem(last=False)
+    else:
+        new_codes = set(codes) - state.unlocked
+        if new_codes:
+            state.unlocked |= new_codes
+            state.cursors.clear()
+    _cache.move_to_end(telegram_id)
+    return state
+
+
+async def _load(telegram_id: int) -> _UserAchievements:
+    state = _cache.get(telegram_id)
+    if state is not None:
+        _cache.move_to_end(telegram_id)
+        return state
+    return _remember(telegram_id, await get_user_achievements(telegram_id))
+
+
+async def get_unlocked_codes(telegram_id: int) -> frozenset[str]:
+    """Коды полученных достижений: из кэша или одним запросом к БД."""
+    return frozenset((await _load(telegram_id)).unlocked)
+
+
+async def check_achievements(
+    user,
+    unlocked: list[str] | None = None,
+    metrics: Iterable[str] | None = None,
+) -> list[dict]:
     """
     Проверяет достижения пользователя. Возвращает список новых достижений
     (каждое — dict с ключами code, title, desc).
+    unlocked — уже полученные коды, если вызывающий их загрузил (тогда кэш не читается из БД).
+    metrics — изменившиеся метрики (None — все). Если нового ничего нет — без запросов к БД.
     """
     if not user:
         return []
 
-    total_lessons = (
-        (getattr(user, "zero_progress", 0) or 0)
-        + (getattr(user, "a1_progress", 0) or 0)
-        + (getattr(user, "a2_progress", 0) or 0)
-        + (getattr(user, "b1_progress", 0) or 0)
-    )
-    streak = getattr(user, "streak", 0) or 0
-    xp = getattr(user, "xp", 0) or 0
-    words_learned = getattr(user, "words_learned", 0) or 0
-    voice_practice_count = getattr(user, "voice_practice_count", 0) or 0
-
-    checks = [
-        (total_lessons >= 1, "first_lesson"),
-        (total_lessons >= 5, "five_lessons"),
-        (streak >= 3, "streak3"),
-        (streak >= 7, "streak7"),
-        (words_learned >= 20, "words20"),
-        (voice_practice_count >= 1, "first_voice"),
-        (xp >= 50, "xp50"),
-        (xp >= 200, "xp200"),
-    ]
-
-    new_achievements: list[dict] = []
     telegram_id = user.telegram_id
+    if unlocked is not None:
+        state = _remember(telegram_id, unlocked)
+    else:
+        state = await _load(telegram_id)
 
-    for condition, code in checks:
-        if not condition:
+    candidates: list[str] = []
+    for metric in (RULES_BY_METRIC if metrics is None else metrics):
+        rules = RULES_BY_METRIC.get(metric)
+        if not rules:
             continue
-        if await has_achievement(telegram_id, code):
+        value = METRICS[metric](user)
+        pos = state.cursor(metric)
+        while pos < len(rules) and value >= rules[pos][0]:
+            code = rules[pos][1]
+            if code not in state.unlocked:
+                candidates.append(code)
+            pos += 1
+    if not candidates:
+        return []
+
+    added = set(await add_achievements(telegram_id, candidates))
+    _remember(telegram_id, candidates)
+
+    new_achievements: list[dict] = []
+    for code in candidates:
+        if code not in added:
+            # Уже добавлено параллельным запросом/другим процессом
             continue
         cfg = ACHIEVEMENTS.get(code, {})
-        await add_achievement(telegram_id, code)
         new_achievements.append({
             "code": code,
             "title": cfg.get("title", code),
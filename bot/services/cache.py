@@ -0,0 +1,128 @@
+"""
+Двухуровневый кэш: LRU в памяти процесса + (опционально) таблица cache_entries в БД с TTL.
+
+Ключ — кортеж из JSON-сериализуемых частей, значение — любой JSON-сериализуемый объект.
+Повторный запрос с тем же ключом отдаётся из памяти за микросекунды; после перезапуска
+или из другого процесса — из БД. Счётчики hit/miss доступны через stats() / cache_stats().
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any
+
+from bot.db.cache_repo import get_cache_entry, purge_expired_cache_entries, set_cache_entry
+
+logger = logging.getLogger(__name__)
+
+_PURGE_INTERVAL = 3600  # сек между чистками просроченных записей в БД
+
+_caches: dict[str, "TieredCache"] = {}
+
+
+def _hash_key(parts: tuple) -> str:
+    raw = json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class TieredCache:
+    def __init__(self, namespace: str, max_size: int, ttl: float, persistent: bool) -> None:
+        self.namespace = namespace
+        self._max_size = max(max_size, 1)
+        self._ttl = ttl
+        self._persistent = persistent
+        # key -> (expires_at_monotonic, value)
+        self._memory: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._last_purge = 0.0
+        self.hits_memory = 0
+        self.hits_db = 0
+        self.misses = 0
+        _caches[namespace] = self
+
+    def _remember(self, key: str, value: Any) -> None:
+        self._memory[key] = (time.monotonic() + self._ttl, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_size:
+            self._memory.popitem(last=False)
+
+    async def get(self, parts: tuple, default: Any = None) -> Any:
+        key = _hash_key(parts)
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return entry[1]
+            del self._memory[key]
+        if self._persistent:
+            try:
+                raw = await get_cache_entry(self.namespace, key)
+            except Exception as e:
+                logger.warning("Кэш %s: ошибка чтения из БД: %s", self.namespace, e)
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self._remember(key, value)
+                self.hits_db += 1
+                return value
+        self.misses += 1
+        return default
+
+    async def set(self, parts: tuple, value: Any) -> None:
+        key = _hash_key(parts)
+        self._remember(key, value)
+        if not self._persistent:
+            return
+        try:
+            expires_at = datetime.utcnow() + timedelta(seconds=self._ttl)
+            await set_cache_entry(self.namespace, key, json.dumps(value, ensure_ascii=False), expires_at)
+            now = time.monotonic()
+            if now - self._last_purge > _PURGE_INTERVAL:
+                self._last_purge = now
+                await purge_expired_cache_entries()
+        except Exception as e:
+            logger.warning("Кэш %s: ошибка записи в БД: %s", self.namespace, e)
+
+    def stats(self) -> dict:
+        hits = self.hits_memory + self.hits_db
+        total = hits + self.misses
+        return {
+            "size": len(self._memory),
+            "hits_memory": self.hits_memory,
+            "hits_db": self.hits_db,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+        }
+
+
+def cache_stats() -> dict[str, dict]:
+    """Статистика всех созданных кэшей: {namespace: {...}}."""
+    return {namespace: cache.stats() for namespace, cache in _caches.items()}
+
+
+GRADING_CACHE_SIZE = int(os.getenv("GRADING_CACHE_SIZE", "5000"))
+GRADING_CACHE_TTL = float(os.getenv("GRADING_CACHE_TTL", str(30 * 24 * 3600)))
+GRADING_CACHE_PERSIST = os.getenv("GRADING_CACHE_PERSIST", "1").strip().lower() not in ("0", "false", "no")
+
+# Результаты проверки ответов через LLM (temperature=0 → детерминированы)
+grading_cache = TieredCache(
+    "grading",
+    max_size=GRADING_CACHE_SIZE,
+    ttl=GRADING_CACHE_TTL,
+    persistent=GRADING_CACHE_PERSIST,
+)
+
+TRANSCRIPTION_CACHE_SIZE = int(os.getenv("TRANSCRIPTION_CACHE_SIZE", "1000"))
+TRANSCRIPTION_CACHE_TTL = float(os.getenv("TRANSCRIPTION_CACHE_TTL", str(7 * 24 * 3600)))
+TRANSCRIPTION_CACHE_PERSIST = os.getenv("TRANSCRIPTION_CACHE_PERSIST", "1").strip().lower() not in ("0", "false", "no")
+
+# Распознанный текст голосовых: по file_unique_id и по хэшу содержимого
+transcription_cache = TieredCache(
+    "transcription",
+    max_size=TRANSCRIPTION_CACHE_SIZE,
+    ttl=TRANSCRIPTION_CACHE_TTL,
+    persistent=TRANSCRIPTION_CACHE_PERSIST,
+)
@@ -0,0 +1,363 @@
+"""
+Реестр уроков (ZERO/A1/A2/B1), общий для всех хендлеров.
+
+Папки data/*_lessons сканируются один раз при старте: файлы валидируются,
+уроки разбираются в неизменяемые структуры и индексируются по (level, lesson_num).
+get / exists / count — O(1), без обращений к диску. watch_content() в фоне
+подхватывает изменённые файлы уроков и карточек без перезапуска бота.
+
+В FSM хранится только ссылка на урок (lesson_level, lesson_num, lesson_hash),
+сам урок достаётся из реестра по этой ссылке.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Mapping
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+
+# Уровень → (папка, допустимые префиксы файлов: латиница и кириллица; первый — приоритетный)
+LEVEL_SOURCES: dict[str, tuple[str, tuple[str, ...]]] = {
+    "ZERO": ("zero_lessons", ("zero",)),
+    "A1": ("a1_lessons", ("a1", "а1")),
+    "A2": ("a2_lessons", ("a2", "а2")),
+    "B1": ("b1_lessons", ("b1", "б1")),
+}
+
+
+@dataclass(frozen=True)
+class LessonEntry:
+    level: str
+    lesson_num: int
+    lesson_id: str  # имя файла без .json (zero_01, а1_05, ...)
+    content_hash: str
+    lesson: Mapping[str, Any]
+
+
+def _content_hash(raw: bytes) -> str:
+    return hashlib.sha1(raw).hexdigest()[:12]
+
+
+def _freeze(obj: Any) -> Any:
+    """dict → MappingProxyType, list → tuple (рекурсивно)."""
+    if isinstance(obj, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return tuple(_freeze(v) for v in obj)
+    return obj
+
+
+def _index_in_options(item: dict) -> bool:
+    """correct_index — целое число, указывающее на элемент списка options."""
+    index = item.get("correct_index")
+    options = item.get("options", [])
+    return (
+        isinstance(index, int) and not isinstance(index, bool)
+        and isinstance(options, list) and 0 <= index < len(options)
+    )
+
+
+def _validate_lesson(level: str, lesson: Any) -> str | None:
+    """Возвращает описание ошибки или None, если урок корректен."""
+    if not isinstance(lesson, dict):
+        return "урок должен быть JSON-объектом"
+    cards = lesson.get("cards", [])
+    if not isinstance(cards, list) or any(not isinstance(c, dict) or not c.get("spanish") for c in cards):
+        return "cards: ожидается список карточек с полем spanish"
+    if level == "ZERO":
+        if not cards:
+            return "ZERO-урок без карточек"
+        quiz = lesson.get("quiz", {})
+        if not isinstance(quiz, dict):
+            return "quiz: ожидается объект"
+        questions = quiz.get("questions", [])
+        if not isinstance(questions, list):
+            return "quiz.questions: ожидается список"
+        for i, q in enumerate(questions):
+            if not isinstance(q, dict):
+                return f"quiz.questions[{i}]: ожидается объект"
+            if not _index_in_options(q):
+                return f"quiz.questions[{i}]: correct_index вне options"
+        return None
+    exercises = lesson.get("exercises", [])
+    if not isinstance(exercises, list):
+        return "exercises: ожидается список"
+    for i, ex in enumerate(exercises):
+        ex_type = ex.get("type") if isinstance(ex, dict) else None
+        if not ex_type:
+            return f"exercises[{i}]: нет type"
+        if ex_type == "choice" and not _index_in_options(ex):
+            return f"exercises[{i}]: correct_index вне options"
+        if ex_type == "voice" and not ex.get("expected"):
+            return f"exercises[{i}]: voice без expected"
+        accepted = ex.get("accepted", [])
+        if not isinstance(accepted, list) or any(not isinstance(a, str) for a in accepted):
+            return f"exercises[{i}]: accepted — список допустимых ответов-строк"
+    return None
+
+
+def _parse_lesson_num(stem: str, prefixes: tuple[str, ...]) -> int | None:
+    prefix, _, num = stem.rpartition("_")
+    if prefix not in prefixes:
+        return None
+    try:
+        return int(num)
+    except ValueError:
+        return None
+
+
+_FileSig = tuple[int, int]  # (st_mtime_ns, st_size)
+
+
+def _file_sig(path: Path) -> _FileSig | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _parse_file(level: str, lesson_num: int, path: Path) -> LessonEntry | None:
+    try:
+        raw = path.read_bytes()
+        lesson = json.loads(raw.decode("utf-8"))
+    except (OSError, ValueError) as e:
+        logger.error("Урок %s не загружен: %s", path.name, e)
+        return None
+    error = _validate_lesson(level, lesson)
+    if error:
+        logger.error("Урок %s не загружен: %s", path.name, error)
+        return None
+    return LessonEntry(
+        level=level,
+        lesson_num=lesson_num,
+        lesson_id=path.stem,
+        content_hash=_content_hash(raw),
+        lesson=_freeze(lesson),
+    )
+
+
+def _level_paths(data_dir: Path, level: str) -> list[tuple[int, Path]]:
+    """Файлы уроков уровня (номер, путь); при дублях номера приоритет у первого префикса."""
+    folder, prefixes = LEVEL_SOURCES[level]
+    lesson_dir = data_dir / folder
+    if not lesson_dir.exists():
+        return []
+    result: list[tuple[int, Path]] = []
+    seen: set[int] = set()
+    for prefix in prefixes:
+        for path in sorted(lesson_dir.glob(f"{prefix}_*.json")):
+            lesson_num = _parse_lesson_num(path.stem, prefixes)
+            if lesson_num is None or lesson_num in seen:
+                continue
+            seen.add(lesson_num)
+            result.append((lesson_num, path))
+    return result
+
+
+@dataclass(frozen=True)
+class LessonCatalog:
+    """
+    Количество уроков по уровням для меню, прогресс-баров и проверок завершения уровня.
+    Пересобирается вместе со снимком реестра; version растёт при каждом изменении контента.
+    """
+    version: int
+    totals: Mapping[str, int]
+
+    def total(self, level: str) -> int:
+        return self.totals.get(level, 0)
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    catalog: LessonCatalog
+    levels: Mapping[str, Mapping[int, LessonEntry]]
+    lesson_ids: Mapping[str, tuple[str, ...]]
+    files: Mapping[Path, tuple[_FileSig, LessonEntry | None]]
+
+
+class LessonRegistry:
+    """Предзагруженные уроки, индексированные по (level, lesson_num) и по хэшу содержимого."""
+
+    def __init__(self, data_dir: Path = DATA_DIR) -> None:
+        self._data_dir = data_dir
+        self._snapshot: _Snapshot | None = None
+        # (level, lesson_num) → текущая и предыдущая версии урока
+        self._versions: dict[tuple[str, int], tuple[LessonEntry, ...]] = {}
+        self._by_hash: Mapping[str, Mapping[str, Any]] = {}
+
+    def load(self) -> None:
+        """Полное сканирование всех уровней."""
+        self._snapshot = None
+        self.reload_changed()
+        logger.info(
+            "Уроки загружены: %s",
+            ", ".join(f"{level}={len(entries)}" for level, entries in self._snapshot.levels.items()),
+        )
+
+    def reload_changed(self) -> list[str]:
+        """
+        Перечитывает только изменившиеся файлы (по mtime и размеру) и атомарно
+        подменяет снимок реестра. Возвращает имена добавленных/изменённых/удалённых файлов.
+        Предыдущая версия урока остаётся доступна по хэшу — начатый урок не ломается;
+        более старые вытесняются, и такой урок продолжается по текущей версии (resolve_lesson).
+        """
+        previous = self._snapshot.files if self._snapshot else {}
+        files: dict[Path, tuple[_FileSig, LessonEntry | None]] = {}
+        levels: dict[str, dict[int, LessonEntry]] = {}
+        changed: list[str] = []
+        for level in LEVEL_SOURCES:
+            entries: dict[int, LessonEntry] = {}
+            for lesson_num, path in _level_paths(self._data_dir, level):
+                sig = _file_sig(path)
+                if sig is None:
+                    continue
+                cached = previous.get(path)
+                if cached is not None and cached[0] == sig:
+                    entry = cached[1]
+                else:
+                    entry = _parse_file(level, lesson_num, path)
+                    changed.append(path.name)
+                    if entry is not None:
+                        self._remember_version(entry)
+                files[path] = (sig, entry)
+                if entry is not None:
+                    entries[lesson_num] = entry
+            levels[level] = entries
+        changed.extend(path.name for path in previous if path not in files)
+        if changed or self._snapshot is None:
+            version = self._snapshot.catalog.version + 1 if self._snapshot else 1
+            self._snapshot = _Snapshot(
+                catalog=LessonCatalog(
+                    version=version,
+                    totals=MappingProxyType({level: len(entries) for level, entries in levels.items()}),
+                ),
+                levels=levels,
+                lesson_ids={
+                    level: tuple(entries[n].lesson_id for n in sorted(entries))
+                    for level, entries in levels.items()
+                },
+                files=files,
+            )
+        if changed:
+            self._by_hash = MappingProxyType({
+                entry.content_hash: entry.lesson
+                for versions in self._versions.values()
+                for entry in versions
+            })
+        return changed
+
+    def _remember_version(self, entry: LessonEntry) -> None:
+        key = (entry.level, entry.lesson_num)
+        versions = self._versions.get(key, ())
+        if not versions or versions[0].content_hash != entry.content_hash:
+            self._versions[key] = (entry, *versions[:1])
+
+    def _current(self) -> _Snapshot:
+        if self._snapshot is None:
+            self.load()
+        return self._snapshot
+
+    def _level(self, level: str) -> Mapping[int, LessonEntry]:
+        return self._current().levels.get(level, {})
+
+    @property
+    def catalog(self) -> LessonCatalog:
+        return self._current().catalog
+
+    def entry(self, level: str, lesson_num: int) -> LessonEntry | None:
+        return self._level(level).get(lesson_num)
+
+    def get(self, level: str, lesson_num: int) -> Mapping[str, Any] | None:
+        entry = self.entry(level, lesson_num)
+        return entry.lesson if entry else None
+
+    def get_hash(self, level: str, lesson_num: int) -> str | None:
+        entry = self.entry(level, lesson_num)
+        return entry.content_hash if entry else None
+
+    def get_by_hash(self, lesson_hash: str) -> Mapping[str, Any] | None:
+        return self._by_hash.get(lesson_hash)
+
+    def exists(self, level: str, lesson_num: int) -> bool:
+        return lesson_num in self._level(level)
+
+    def count(self, level: str) -> int:
+        return self._current().catalog.total(level)
+
+    def lesson_ids(self, level: str) -> tuple[str, ...]:
+        """lesson_id уровня в порядке номеров (для ZERO: zero_01, zero_02, ...)."""
+        return self._current().lesson_ids.get(level, ())
+
+
+registry = LessonRegistry()
+
+
+def lesson_ref(level: str, lesson_num: int) -> dict:
+    """Ссылка на урок для state.update_data (вместо копии урока)."""
+    return {
+        "lesson_level": level,
+        "lesson_num": lesson_num,
+        "lesson_hash": registry.get_hash(level, lesson_num),
+    }
+
+
+def resolve_lesson(data: dict) -> Mapping[str, Any]:
+    """Возвращает урок по ссылке из данных FSM: сначала по хэшу (та версия, с которой урок начат)."""
+    lesson_hash = data.get("lesson_hash")
+    if lesson_hash:
+        lesson = registry.get_by_hash(lesson_hash)
+        if lesson is not None:
+            return lesson
+    level = data.get("lesson_level")
+    lesson_num = data.get("lesson_num")
+    if level in LEVEL_SOURCES and lesson_num:
+        return registry.get(level, lesson_num) or {}
+    return {}
+
+
+def _transcription_sigs() -> dict[Path, _FileSig | None]:
+    from bot.utils import TRANSCRIPTION_FILES
+
+    return {DATA_DIR / name: _file_sig(DATA_DIR / name) for name in TRANSCRIPTION_FILES}
+
+
+def _reload_content(card_sigs: dict[Path, _FileSig | None]) -> tuple[list[str], dict[Path, _FileSig | None]]:
+    """Синхронная часть перезагрузки (выполняется в отдельном потоке)."""
+    from bot.utils import reload_transcriptions
+
+    changed = registry.reload_changed()
+    new_card_sigs = _transcription_sigs()
+    changed_cards = [path.name for path, sig in new_card_sigs.items() if card_sigs.get(path) != sig]
+    if changed_cards:
+        reload_transcriptions()
+    return changed + changed_cards, new_card_sigs
+
+
+async def watch_content(interval: float) -> None:
+    """
+    Фоновый опрос mtime файлов уроков и карточек (cards_seed.json, *_transcriptions.json).
+    Изменённые файлы перечитываются в потоке, не блокируя event loop.
+    """
+    card_sigs = await asyncio.to_thread(_transcription_sigs)
+    while True:
+        await asyncio.sleep(interval)
+        started = time.perf_counter()
+        try:
+            changed, card_sigs = await asyncio.to_thread(_reload_content, card_sigs)
+        except Exception as e:
+            logger.warning("Перезагрузка контента не удалась: %s", e)
+            continue
+        if changed:
+            logger.info(
+                "Контент обновлён за %.1f мс: %s",
+                (time.perf_counter() - started) * 1000,
+                ", ".join(changed),
+            )
@@ -1,22 +1,56 @@
 """
-LLM-сервис для проверки fill_text и оценки dialogue.
-Поддерживает:
-- Прямой OpenAI API (OPENAI_API_KEY)
-- ProxyAPI / любой OpenAI-совместимый прокси (PROXYAPI_BASE_URL + PROXYAPI_API_KEY)
+LLM-сервис проверки ответов: fill_text, dialogue (в том числе потоком), переводы
+в повторениях и голосовые ответы.
+
+- Клиент один на процесс (_get_llm_client): keep-alive пул соединений, HTTP/2 при
+  установленном h2; его же использует распознавание речи. Прямой OpenAI API
+  (OPENAI_API_KEY) или OpenAI-совместимый прокси (PROXYAPI_BASE_URL + PROXYAPI_API_KEY).
+- Все запросы идут через llm_dispatch (_chat): лимиты, повторы на 429/5xx, склейка
+  одинаковых запросов; расход токенов — prompts.record_usage.
+- Очевидные случаи решаются без LLM: local_grader для текста, phonetics для голоса.
+  Вердикты LLM кэшируются (grading_cache) с версией промпта в ключе.
+- fill_text и dialogue проверяются со structured output (json_schema); если прокси
+  или модель его не поддерживает — json_object. Переводы из очереди повторений
+  проверяются пакетом одним запросом (check_translations_batch).
 """
+import asyncio
+import importlib.util
 import json
 import logging
 import os
 import re
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterable, Sequence
+
+from bot.services.cache import grading_cache
+from bot.services.llm_dispatch import dispatch, request_key
+from bot.services.local_grader import AMBIGUOUS, CORRECT, WRONG, grade_locally
+from bot.services.phonetics import score_pronunciation
+from bot.services import prompts
 
 try:
-    from openai import AsyncOpenAI
+    from openai import AsyncOpenAI, BadRequestError, DefaultAsyncHttpxClient
     HAS_OPENAI = True
 except ImportError:
     HAS_OPENAI = False
 
+try:
+    import httpx
+    HAS_HTTPX = True
+except ImportError:
+    HAS_HTTPX = False
+
+# h2 нужен httpx для HTTP/2; сам модуль не используется — только проверяем, что он установлен
+HAS_HTTP2 = importlib.util.find_spec("h2") is not None
+
 logger = logging.getLogger(__name__)
 
+# Пул соединений общего клиента LLM/Whisper
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "1").strip().lower() not in ("0", "false", "no")
+
 
 def normalize_spanish(text: str) -> str:
     """
@@ -39,6 +73,52 @@ def normalize_spanish(text: str) -> str:
     return re.sub(r"\s+", " ", t.strip())
 
 
+# Модель для проверок с temperature=0 (входит в ключ кэша проверок)
+_GRADING_MODEL = "gpt-4o-mini"
+
+# Одиночная и пакетная проверка отвечают на один вопрос — кэш у них общий
+_TRANSLATION_PROMPT_VERSION = prompts.version(prompts.TRANSLATION) + prompts.version(prompts.TRANSLATION_BATCH)
+_FILL_TEXT_PROMPT_VERSION = prompts.version(prompts.FILL_TEXT)
+
+
+def _translation_cache_key(user_answer: str, expected_answer: str, spanish_content: str) -> tuple:
+    return (
+        "translation", _TRANSLATION_PROMPT_VERSION, _GRADING_MODEL,
+        spanish_content, expected_answer, normalize_spanish(user_answer),
+    )
+
+
+def _grade_translation_locally(user_answer: str, expected_answer: str) -> bool | None:
+    """
+    Локально решаем только совпадения: для перевода по смыслу «далёкий» ответ
+    может оказаться синонимом (вчера = накануне), его проверяет LLM.
+    """
+    local = grade_locally(user_answer, expected_answer)
+    if local.verdict == CORRECT:
+        return True
+    if local.reason == "empty":
+        return False
+    return None
+
+
+async def _check_translation_llm(
+    client: "AsyncOpenAI",
+    user_answer: str,
+    expected_answer: str,
+    spanish_content: str,
+) -> bool:
+    prompt = prompts.translation_prompt(spanish_content, expected_answer, user_answer)
+    try:
+        resp = await _chat(client, prompt, model=_GRADING_MODEL, temperature=0)
+        text = (resp.choices[0].message.content or "").strip().lower()
+        result = text.startswith("да") or text == "yes"
+    except Exception as e:
+        logger.warning("LLM check_translation_equivalent error: %s", e)
+        return False
+    await grading_cache.set(_translation_cache_key(user_answer, expected_answer, spanish_content), result)
+    return result
+
+
 async def check_translation_equivalent(
     user_answer: str,
     expected_answer: str,
@@ -48,86 +128,169 @@ async def check_translation_equivalent(
     Проверяет, эквивалентны ли два перевода по смыслу.
     Учитывает: опущение местоимений (Живем = Мы живём), синонимы, пунктуацию.
     """
+    local = _grade_translation_locally(user_answer, expected_answer)
+    if local is not None:
+        return local
+
     client = _get_llm_client()
     if not client:
         return False
 
-    prompt = (
-        f"Исходный текст на испанском: {spanish_content}\n\n"
-        f"Эталонный ответ: {expected_answer}\n"
-        f"Ответ ученика: {user_answer}\n\n"
-        "Вопрос: эквивалентен ли ответ ученика эталону?\n\n"
-        "Принимай (да): опущение местоимений (Живем = Мы живём), синонимы, разную пунктуацию, отсутствие акцентов/ñ.\n\n"
-        "Отклоняй (нет): грамматические ошибки — неправильное согласование рода/числа "
-        "(buenos noches → неверно, правильно buenas noches), неправильные артикли, спряжения, "
-        "опечатки, меняющие смысл. Ответь ТОЛЬКО да или нет."
-    )
+    cached = await grading_cache.get(_translation_cache_key(user_answer, expected_answer, spanish_content))
+    if cached is not None:
+        return cached
+    return await _check_translation_llm(client, user_answer, expected_answer, spanish_content)
+
+
+async def _check_translations_in_one_request(
+    client: "AsyncOpenAI",
+    items: Sequence[tuple[str, str, str]],
+    pending: list[int],
+    results: list[bool | None],
+) -> list[int]:
+    """Один запрос со structured output на все pending. Возвращает индексы без ответа."""
+    payload = [
+        {"id": n, "spanish": items[i][2], "expected": items[i][1], "answer": items[i][0]}
+        for n, i in enumerate(pending)
+    ]
     try:
-        resp = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
+        resp = await _chat(
+            client,
+            prompts.translation_batch_prompt(json.dumps(payload, ensure_ascii=False)),
+            model=_GRADING_MODEL,
             temperature=0,
+            response_format={"type": "json_schema", "json_schema": prompts.TRANSLATION_BATCH_SCHEMA},
         )
-        text = (resp.choices[0].message.content or "").strip().lower()
-        return text.startswith("да") or text == "yes"
+        data = _parse_llm_json(resp.choices[0].message.content) or {}
     except Exception as e:
-        logger.warning("LLM check_translation_equivalent error: %s", e)
-        return False
+        logger.warning("LLM check_translations_batch error: %s", e)
+        return pending
+
+    verdicts: dict[int, bool] = {}
+    for entry in data.get("results") or []:
+        if isinstance(entry, dict) and isinstance(entry.get("id"), int) and isinstance(entry.get("equivalent"), bool):
+            verdicts[entry["id"]] = entry["equivalent"]
+    missing: list[int] = []
+    for n, i in enumerate(pending):
+        if n not in verdicts:
+            missing.append(i)
+            continue
+        results[i] = verdicts[n]
+        await grading_cache.set(_translation_cache_key(*items[i]), verdicts[n])
+    if missing:
+        logger.warning("LLM check_translations_batch: нет ответа для %d из %d", len(missing), len(pending))
+    return missing
+
+
+async def check_translations_batch(items: Sequence[tuple[str, str, str]]) -> list[bool]:
+    """
+    check_translation_equivalent для нескольких ответов: items — (user_answer, expected_answer,
+    spanish_content). Решённые локально и найденные в кэше не отправляются, остальные —
+    одним запросом. Если пакетный ответ не разобран, недостающие проверяются по одному.
+    """
+    results: list[bool | None] = [None] * len(items)
+    pending: list[int] = []
+    for i, (user_answer, expected_answer, spanish_content) in enumerate(items):
+        local = _grade_translation_locally(user_answer, expected_answer)
+        if local is not None:
+            results[i] = local
+            continue
+        cached = await grading_cache.get(_translation_cache_key(user_answer, expected_answer, spanish_content))
+        if cached is not None:
+            results[i] = cached
+            continue
+        pending.append(i)
+
+    client = _get_llm_client()
+    if pending and client:
+        if len(pending) > 1:
+            pending = await _check_translations_in_one_request(client, items, pending, results)
+        checked = await asyncio.gather(*(_check_translation_llm(client, *items[i]) for i in pending))
+        for i, ok in zip(pending, checked):
+            results[i] = ok
+    return [bool(r) for r in results]
+
+
+_llm_client: "AsyncOpenAI | None" = None
+
+
+def _build_http_client():
+    """httpx-клиент с keep-alive пулом (и HTTP/2, если установлен пакет h2)."""
+    if not HAS_HTTPX:
+        return None
+    return DefaultAsyncHttpxClient(
+        http2=LLM_HTTP2 and HAS_HTTP2,
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+    )
 
 
 def _get_llm_client() -> "AsyncOpenAI | None":
-    """Создаёт клиент: ProxyAPI или прямой OpenAI."""
+    """
+    Общий на процесс клиент: ProxyAPI или прямой OpenAI.
+    Создаётся при первом вызове; соединения переиспользуются между запросами.
+    """
+    global _llm_client
+    if _llm_client is not None:
+        return _llm_client
     if not HAS_OPENAI:
         return None
     base_url = os.getenv("PROXYAPI_BASE_URL") or os.getenv("OPENAI_BASE_URL")
     api_key = os.getenv("PROXYAPI_API_KEY") or os.getenv("OPENAI_API_KEY")
     if not api_key:
         return None
-    kwargs = {"api_key": api_key}
+    # Повторы на 429/5xx делает llm_dispatch (с общими лимитами), не SDK
+    kwargs = {"api_key": api_key, "max_retries": 0}
     if base_url:
         kwargs["base_url"] = base_url.rstrip("/")
-    return AsyncOpenAI(**kwargs)
-
+    http_client = _build_http_client()
+    if http_client is not None:
+        kwargs["http_client"] = http_client
+    _llm_client = AsyncOpenAI(**kwargs)
+    return _llm_client
 
-_SYSTEM_PROMPT = """Ты — преподаватель испанского языка. Проверяй ответы ученика, опираясь на правила испанской грамматики и контекст урока (если передан). Отвечай ТОЛЬКО валидным JSON.
 
-КРИТИЧЕСКИ ВАЖНО — НЕ СЧИТАЙ ОШИБКОЙ (игнорируй полностью, НЕ указывай в feedback):
-- Нормализация ввода с английской клавиатуры: n вместо ñ (manana=mañana, nino=niño), отсутствие акцентов (Como=Cómo, Adios=Adiós). Это НЕ «отсутствие акцента» и НЕ «орфография» — ученик мог печатать без испанской раскладки. Полностью игнорируй.
-- Отсутствие ¿¡ в начале: Como estas? = ¿Cómo estás?
-- Заглавная буква в начале предложения: после точки (.), ! или ? — заглавная ПРАВИЛЬНА. НЕ указывай «заглавная в середине», если слово идёт после точки/восклицания/вопроса.
-Если фраза отличается ТОЛЬКО n/ñ, акцентами, ¿¡ или заглавной после точки — это НЕ ошибка. Не указывай её в feedback.
-
-ТИПЫ ОШИБОК — указывай ТОЧНО (НЕ придумывай):
-- [Орфография]: опечатка, лишняя/пропущенная буква (professora→profesora). НЕ включай сюда n вместо ñ или отсутствие акцентов — это нормализация клавиатуры, не ошибка!
-- [Согласование рода]: неправильный род слова (padre→profesor, madre→profesora — когда ученик написал profesor вместо profesora при описании madre)
-- [Спряжение]: ошибка в глаголе (soy→es, tiene→tienen)
-- [Артикль/предлог]: el/la/un/una, en/de и т.д.
-- [Смысл]: пропущено существительное или дополнение, фраза неполная по смыслу. Пример: «vi en el cine» — неясно, что смотрел; правильно «vi una película en el cine». НЕ указывай [Смысл], если фраза грамматически полна: возвратные глаголы (me levanto, me lavo, me visto, me ducho) не требуют дополнения; «me visto, voy al trabajo» — корректно; последовательность действий через запятую — ок.
-
-Пример: «professora» (двойная s) — это [Орфография], не согласование.
-
-ОПОРА НА ГРАММАТИКУ И СМЫСЛ:
-- Согласование рода, спряжение (ser/estar, tener), артикли, предлоги
-- [Смысл] — только когда объективно не хватает слова: «vi en el cine» (нет объекта у ver). Возвратные глаголы (levantarse, lavarse, vestirse, ducharse) и ir/llegar — самодостаточны, дополнение после «me visto» не требуется. «me lavo, me visto, voy al trabajo» — полная и корректная фраза.
-- Если передан «Контекст урока» — учитывай его при оценке
-- corrected_text должен быть полным и эталонным испанским (с акцентами, ñ, ¿¡), включая недостающие слова по смыслу
-- НЕ придумывай ошибки: каждая ошибка = реальное исправление (оригинал ≠ исправление)
-- Заглавная после точки/!/? — начало нового предложения, это ПРАВИЛЬНО. Не пиши «заглавная в середине предложения», если слово стоит после точки.
+async def _chat(client: "AsyncOpenAI", prompt: prompts.Prompt, **kwargs):
+    """
+    chat.completions.create через диспетчер: лимиты, повторы, склейка одинаковых запросов.
+    Расход токенов учитывается в prompts.record_usage (для потока — по последнему чанку).
+    """
+    kwargs.update(prompt.request_options())
+    if kwargs.get("stream"):
+        kwargs["stream_options"] = {"include_usage": True}
+    # Поток читает только вызвавший — такие запросы не склеиваются
+    resp = await dispatch(
+        kwargs["model"],
+        lambda: client.chat.completions.create(**kwargs),
+        key=None if kwargs.get("stream") else request_key("chat", **kwargs),
+    )
+    if not kwargs.get("stream"):
+        prompts.record_usage(prompt, getattr(resp, "usage", None))
+    return resp
 
-ВАЖНО: «Ответ ученика (оригинал)» — то, что РЕАЛЬНО написал ученик. Не указывай ошибку, если в оригинале уже правильно (напр. «Mi» с заглавной после точки — корректно, не ошибка).
 
-ФОРМАТ JSON:
+def _json_mode_unsupported(error: Exception) -> bool:
+    """
+    400 именно на response_format — прокси/модель без json_schema.
+    Прочие 400 (длина контекста, модерация, неверный ввод) к формату ответа отношения не имеют.
+    """
+    if not (HAS_OPENAI and isinstance(error, BadRequestError)):
+        return False
+    if error.param and "response_format" in error.param:
+        return True
+    details = f"{error.message} {error.body}".lower()
+    return "response_format" in details or "json_schema" in details
 
-Правильно:
-{"correct": true, "feedback": "Отлично! Все правила соблюдены."}
 
-Неправильно (feedback — ТОЛЬКО список ошибок, без «Исправленный текст»; corrected_text покажем отдельно):
-{
-  "correct": false,
-  "feedback": "Ошибки:\\n1. [Тип]: [оригинал] → [исправление] ([объяснение])\\n2. ...",
-  "corrected_text": "[полный эталонный испанский текст]"
-}
-"""
+async def close_llm_client() -> None:
+    """Закрывает общий клиент и его пул соединений (при остановке бота)."""
+    global _llm_client
+    client, _llm_client = _llm_client, None
+    if client is not None:
+        await client.close()
 
 
 def _parse_llm_json(text: str) -> dict | None:
@@ -161,105 +324,141 @@ def _parse_llm_json(text: str) -> dict | None:
     return None
 
 
-def _filter_accents_only_errors(feedback: str) -> str:
+@dataclass(frozen=True)
+class GradingError:
+    type: str
+    original: str
+    corrected: str
+    explanation: str
+
+
+@dataclass(frozen=True)
+class GradingResult:
+    correct: bool
+    errors: tuple[GradingError, ...]
+    corrected_text: str
+    feedback: str
+
+
+def _grading_error(entry) -> GradingError | None:
+    if not isinstance(entry, dict):
+        return None
+    return GradingError(
+        type=str(entry.get("type", "")).strip("[] "),
+        original=str(entry.get("original", "")).strip(),
+        corrected=str(entry.get("corrected", "")).strip(),
+        explanation=str(entry.get("explanation", "")).strip(),
+    )
+
+
+def _grading_result(text: str | None) -> GradingResult | None:
+    """Ответ по prompts.GRADING_SCHEMA → GradingResult (structured output — валидный JSON)."""
+    try:
+        data = json.loads(text or "")
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("correct"), bool):
+        return None
+    errors = tuple(e for e in map(_grading_error, data.get("errors") or []) if e is not None)
+    return GradingResult(
+        correct=data["correct"],
+        errors=errors,
+        corrected_text=str(data.get("corrected_text") or "").strip(),
+        feedback=str(data.get("feedback") or "").strip(),
+    )
+
+
+def _is_real_error(error: GradingError) -> bool:
     """
-    Удаляет из feedback ошибки, где оригинал и исправление совпадают после нормализации
-    (только акценты, n/ñ, ¿¡ — не считаем ошибкой, в т.ч. ввод с английской клавиатуры).
-    Также убирает ложные срабатывания про «заглавную в середине предложения».
+    Не ошибка: оригинал и исправление совпадают после нормализации (акценты, n/ñ, ¿¡ —
+    ввод с английской клавиатуры) и «заглавная в середине предложения» после точки.
     """
-    lines = feedback.split("\n")
-    result = []
-    for line in lines:
-        if "заглавн" in line.lower() and "середине предложения" in line.lower():
-            continue
-        # Паттерн "[...] → [...]" (в скобках)
-        match = re.search(r"\[\s*([^\]]+)\s*\]\s*→\s*\[\s*([^\]]+)\s*\]", line)
-        if match:
-            orig, corr = match.group(1).strip(), match.group(2).strip()
-            if normalize_spanish(orig) == normalize_spanish(corr):
-                continue
-        # Паттерн "слово1 → слово2" без скобок (manana → mañana, nino → niño)
-        match2 = re.search(r"([a-záéíóúñüA-ZÁÉÍÓÚÑÜ]+)\s*→\s*([a-záéíóúñüA-ZÁÉÍÓÚÑÜ]+)", line)
-        if match2:
-            orig, corr = match2.group(1).strip(), match2.group(2).strip()
-            if normalize_spanish(orig) == normalize_spanish(corr):
-                continue
-        result.append(line)
-    return "\n".join(result).strip()
-
-
-def _format_feedback(data: dict) -> str:
-    """Форматирует feedback: correct → feedback; incorrect → ❌ + список ошибок + 👉 Правильно будет."""
-    correct = data.get("correct", False)
-    feedback = data.get("feedback", "Проверь ответ.")
-    if correct:
-        return feedback
-    # Убираем дублирование «Исправленный текст» — показываем только 👉 Правильно будет
-    feedback = re.sub(r"\n?Исправленный текст:.*$", "", feedback, flags=re.IGNORECASE | re.DOTALL)
-    feedback = feedback.strip()
-    # Убираем ошибки, где только акценты/ñ/¿¡
-    feedback = _filter_accents_only_errors(feedback)
-    # Если все ошибки были только про акценты — считаем верно
-    if not feedback or feedback == "Ошибки:":
+    if error.original and normalize_spanish(error.original) == normalize_spanish(error.corrected):
+        return False
+    explanation = error.explanation.lower()
+    return not ("заглавн" in explanation and "середине предложения" in explanation)
+
+
+def _format_errors(errors: Iterable[GradingError]) -> str:
+    lines = ["Ошибки:"]
+    for i, e in enumerate(errors, 1):
+        line = f"{i}. [{e.type}]: {e.original} → {e.corrected}"
+        if e.explanation:
+            line += f" ({e.explanation})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _format_grading(result: GradingResult) -> str:
+    """correct → feedback; incorrect → ❌ + список ошибок + 👉 Правильно будет."""
+    if result.correct:
+        return result.feedback or "✅ Верно!"
+    errors = [e for e in result.errors if _is_real_error(e)]
+    if result.errors and not errors:
+        # Все ошибки были только про акценты/ñ/¿¡ — считаем верно
         return "✅ Верно!"
-    corrected = data.get("corrected_text", "")
-    if corrected:
-        return f"❌ {feedback}\n👉 Правильно будет: {corrected}"
-    return f"❌ {feedback}"
-
-
-_VOICE_CHECK_SYSTEM = """Ты — преподаватель испанского. Оценивай голосовой ответ ученика по распознанному тексту (Whisper).
+    text = _format_errors(errors) if errors else (result.feedback or "Проверь ответ.")
+    if result.corrected_text:
+        return f"❌ {text}\n👉 Правильно будет: {result.corrected_text}"
+    return f"❌ {text}"
 
-Ученик должен произносить фразу в соответствии с правилами испанского произношения:
-- Гласные: чёткие a, e, i, o, u (без редукции); á, é, í, ó, ú — ударение на нужном слоге.
-- Согласные: ñ (отдельный звук, не «н»); r/rr/l различаются; j [x]; ll; v и b в испанском различаются.
-- Интонация: вопросительные предложения — повышение тона; паузы вместо запятых.
 
-Оценивай корректность произношения в целом: каждая гласная и согласная должна звучать по правилам испанского. Распознанная транскрипция отражает, что услышано — расхождение указывает на ошибку (грамматическую или произносительную).
+# Сбрасывается, если провайдер отклонил json_schema: дальше — json_object с той же схемой в промпте
+_structured_output = True
 
-Типичные ошибки произношения (видны в транскрипции):
-- v/b, r/rr/l, ll/y, j/g; ñ→n; неверное ударение (путаница гласных под ударением).
 
-При неверном ответе в feedback_ru дай краткое пояснение на русском:
-- Грамматика: тип ([Спряжение], [Артикль/предлог]) и правило.
-- Произношение: укажи, какой звук/слог произнесён неверно и как должно быть по правилам испанского.
-1–2 предложения."""
+def _grading_response_format() -> dict:
+    if _structured_output:
+        return {"type": "json_schema", "json_schema": prompts.GRADING_SCHEMA}
+    return {"type": "json_object"}
 
 
-async def check_voice_answer(expected: str, recognized_text: str) -> tuple[bool, str, str]:
+async def _grade(client: "AsyncOpenAI", prompt: prompts.Prompt, **kwargs) -> GradingResult | None:
+    """Один запрос проверки fill_text/dialogue со structured output. None — ошибка или не разобран ответ."""
+    global _structured_output
+    try:
+        resp = await _chat(client, prompt, response_format=_grading_response_format(), **kwargs)
+    except Exception as e:
+        if _structured_output and _json_mode_unsupported(e):
+            logger.warning("LLM: json_schema не поддерживается (%s), переходим на json_object", e)
+            _structured_output = False
+            return await _grade(client, prompt, **kwargs)
+        logger.warning("LLM %s error: %s", prompt.kind, e)
+        return None
+    text = resp.choices[0].message.content
+    result = _grading_result(text)
+    if result is None:
+        logger.warning("LLM %s: ответ не соответствует схеме: %s", prompt.kind, (text or "None")[:200])
+    return result
+
+
+async def check_voice_answer(
+    expected: str,
+    recognized_text: str,
+    open_answer: bool = False,
+) -> tuple[bool, str, str]:
     """
     Проверяет распознанный голосовой ответ на соответствие ожидаемой фразе.
     Оценивается корректное произношение по правилам испанского: гласные, согласные, ударения, интонация.
+    Совпадение по звучанию, типичные ошибки произношения и явно другая фраза решаются
+    локально (phonetics); в LLM — только пограничные случаи.
+    open_answer — готовой фразы нет (dialogue/open), expected лишь описывает задание:
+    сравнивать по звучанию не с чем, проверяет только LLM.
     Возвращает (correct, feedback_ru, corrected).
     """
+    if not open_answer:
+        local = score_pronunciation(expected, recognized_text)
+        if local.verdict == CORRECT:
+            return True, local.feedback, ""
+        if local.verdict == WRONG:
+            return False, local.feedback, expected
+
     client = _get_llm_client()
     if not client:
-        # Строгое сравнение: все гласные и согласные по правилам испанского
-        user_clean = (recognized_text or "").strip().lower()
-        exp_clean = (expected or "").strip().lower()
-        if user_clean == exp_clean:
-            return True, "Отлично!", ""
         return False, "Проверь произношение по правилам испанского: гласные, согласные, ударения, интонацию.", expected
 
-    prompt = (
-        f"Ученик должен был произнести фразу на испанском по правилам произношения (гласные, согласные, ударения, интонация).\n\n"
-        f"Ожидаемая фраза: {expected}\n"
-        f"Распознанный текст (Whisper): {recognized_text}\n\n"
-        "1) Сравни СТРОГО: соответствие правилам испанского произношения — каждая гласная и согласная.\n"
-        "2) Если неверно — определи: грамматика (спряжение, артикль) или произношение (звук, ударение, интонация).\n"
-        "3) feedback_ru — пояснение на русском: какой звук/слог произнесён неверно и как должно быть.\n\n"
-        'Ответь ТОЛЬКО валидным JSON:\n'
-        '{"correct": true/false, "feedback_ru": "пояснение на русском", "corrected": "эталонная фраза"}'
-    )
     try:
-        resp = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": _VOICE_CHECK_SYSTEM},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0,
-        )
+        resp = await _chat(client, prompts.voice_prompt(expected, recognized_text), model="gpt-4o-mini", temperature=0)
         text = resp.choices[0].message.content
         data = _parse_llm_json(text)
         if data:
@@ -269,23 +468,30 @@ async def check_voice_answer(expected: str, recognized_text: str) -> tuple[bool,
             return correct, feedback_ru or ("Отлично!" if correct else "Проверь ответ."), corrected
     except Exception as e:
         logger.warning("LLM check_voice_answer error: %s", e)
-    user_clean = (recognized_text or "").strip().lower()
-    exp_clean = (expected or "").strip().lower()
-    if user_clean == exp_clean:
-        return True, "Верно!", ""
     return False, "Проверь произношение по правилам испанского: гласные, согласные, ударения, интонацию.", expected
 
 
-async def check_fill_text(user_answer: str, expected: str) -> tuple[bool, str]:
+async def check_fill_text(
+    user_answer: str,
+    expected: str,
+    accepted: Iterable[str] = (),
+) -> tuple[bool, str]:
     """
     Проверка ответа fill_text. Возвращает (is_correct, feedback).
-    При наличии LLM — умная проверка с учётом акцентов/ñ.
-    Иначе — fallback: сравнение normalize_spanish(user) с normalize_spanish(expected).
+    Очевидные случаи (совпадение с эталоном или допустимым вариантом accepted,
+    явно другой ответ) решаются локально; спорные — через LLM с учётом акцентов/ñ.
+    Без LLM — сравнение normalize_spanish(user) с normalize_spanish(expected).
     """
     original_text = user_answer
     normalized_text = normalize_spanish(original_text)
     expected_norm = normalize_spanish(expected)
 
+    local = grade_locally(original_text, expected, accepted)
+    if local.verdict == CORRECT:
+        return True, "✅ Верно!"
+    if local.verdict != AMBIGUOUS:
+        return False, f"❌ Неверно.\n👉 Правильно будет: {expected}"
+
     # Fallback без API key
     client = _get_llm_client()
     if not client:
@@ -293,41 +499,28 @@ async def check_fill_text(user_answer: str, expected: str) -> tuple[bool, str]:
             return True, "✅ Верно!"
         return False, f"❌ Неверно.\n👉 Правильно будет: {expected}"
 
+    cache_key = ("fill_text", _FILL_TEXT_PROMPT_VERSION, _GRADING_MODEL, expected, normalized_text)
+    cached = await grading_cache.get(cache_key)
+    if cached is not None:
+        return cached[0], cached[1]
+
     # LLM-проверка
-    messages = [
-        {"role": "system", "content": _SYSTEM_PROMPT},
-        {
-            "role": "user",
-            "content": (
-                f"Задание: вставить слово в пропуск.\n"
-                f"Правильный ответ: {expected}\n\n"
-                f"Ответ ученика (оригинал): {original_text}\n"
-                f"Ответ ученика (нормализован): {normalized_text}"
-            ),
-        },
-    ]
-    for use_json_mode in (True, False):
-        try:
-            kwargs = {"model": "gpt-4o-mini", "messages": messages, "temperature": 0}
-            if use_json_mode:
-                kwargs["response_format"] = {"type": "json_object"}
-            resp = await client.chat.completions.create(**kwargs)
-            text = resp.choices[0].message.content
-            data = _parse_llm_json(text)
-            if data:
-                correct = data.get("correct", False)
-                # Постпроверка: если LLM пометил неверно, но отличия только в акцентах/ñ/¿¡ — считаем верно
-                if not correct:
-                    corrected = data.get("corrected_text", expected)
-                    if normalize_spanish(original_text) == normalize_spanish(corrected):
-                        correct = True
-                return correct, "✅ Верно!" if correct else _format_feedback(data)
-            logger.warning("LLM fill_text: не удалось распарсить JSON: %s", text[:200] if text else "None")
-            break
-        except Exception as e:
-            logger.warning("LLM fill_text error: %s", e)
-            if not use_json_mode:
-                break
+    result = await _grade(
+        client,
+        prompts.fill_text_prompt(expected, original_text, normalized_text),
+        model=_GRADING_MODEL,
+        temperature=0,
+    )
+    if result is not None:
+        correct = result.correct
+        # Постпроверка: если LLM пометил неверно, но отличия только в акцентах/ñ/¿¡ — считаем верно
+        if not correct and normalize_spanish(original_text) == normalize_spanish(result.corrected_text or expected):
+            correct = True
+        feedback = "✅ Верно!" if correct else _format_grading(result)
+        if feedback == "✅ Верно!":
+            correct = True
+        await grading_cache.set(cache_key, [correct, feedback])
+        return correct, feedback
 
     # Fallback при ошибке LLM
     if normalized_text == expected_norm:
@@ -335,6 +528,30 @@ async def check_fill_text(user_answer: str, expected: str) -> tuple[bool, str]:
     return False, f"❌ Неверно.\n👉 Правильно будет: {expected}"
 
 
+def _dialogue_prompt(original_text: str, task: str, theory: str) -> prompts.Prompt:
+    return prompts.dialogue_prompt(task, theory, original_text, normalize_spanish(original_text))
+
+
+def _dialogue_feedback(result: GradingResult, original_text: str) -> str:
+    # Постпроверка: если LLM пометил как неверно, но отличия только в акцентах/ñ/¿¡ — считаем верно
+    if not result.correct and result.corrected_text:
+        if normalize_spanish(original_text) == normalize_spanish(result.corrected_text):
+            return "✅ Верно!"
+    return _format_grading(result)
+
+
+def _dialogue_fallback(original_text: str, expected: str | None) -> str:
+    """Ответ при ошибке LLM (Connection error, timeout и т.п.)."""
+    if expected is not None:
+        if normalize_spanish(original_text) == normalize_spanish(expected):
+            return "✅ Верно!"
+        return f"❌ Неверно.\n👉 Правильно будет: {expected}"
+    return (
+        "⚠️ Проверка временно недоступна (ошибка связи с API). "
+        "Твой ответ принят — продолжай! Когда соединение восстановится, получишь развёрнутую обратную связь."
+    )
+
+
 async def evaluate_dialogue(
     user_text: str,
     prompt: str,
@@ -346,61 +563,144 @@ async def evaluate_dialogue(
     theory — контекст урока (грамматика, лексика) для опоры при проверке.
     """
     original_text = user_text
-    normalized_text = normalize_spanish(original_text)
 
     # Fallback без API key
     client = _get_llm_client()
     if not client:
         if expected is not None:
-            expected_norm = normalize_spanish(expected)
-            if normalized_text == expected_norm:
-                return "✅ Верно!"
-            return f"❌ Неверно.\n👉 Правильно будет: {expected}"
+            return _dialogue_fallback(original_text, expected)
         return (
             "⚠️ Проверка через ИИ недоступна (нет API ключа). "
             "Добавь PROXYAPI_API_KEY или OPENAI_API_KEY в .env"
         )
 
-    user_content = f"Задание: {prompt}\n\n"
-    if theory:
-        user_content += f"Контекст урока (опирайся на эти правила): {theory}\n\n"
-    user_content += f"Ответ ученика (оригинал): {original_text}\n"
-    user_content += f"Ответ ученика (нормализован): {normalized_text}"
-
     # LLM-оценка
-    messages = [
-        {"role": "system", "content": _SYSTEM_PROMPT},
-        {"role": "user", "content": user_content},
-    ]
-    for use_json_mode in (True, False):
-        try:
-            kwargs = {"model": "gpt-4o-mini", "messages": messages, "temperature": 0.2}
-            if use_json_mode:
-                kwargs["response_format"] = {"type": "json_object"}
-            resp = await client.chat.completions.create(**kwargs)
-            text = resp.choices[0].message.content
-            data = _parse_llm_json(text)
-            if data:
-                # Постпроверка: если LLM пометил как неверно, но отличия только в акцентах/ñ/¿¡ — считаем верно
-                if not data.get("correct", False):
-                    corrected = data.get("corrected_text", "")
-                    if corrected and normalize_spanish(original_text) == normalize_spanish(corrected):
-                        return "✅ Верно!"
-                return _format_feedback(data)
-            logger.warning("LLM dialogue: не удалось распарсить JSON: %s", text[:200] if text else "None")
+    result = await _grade(client, _dialogue_prompt(original_text, prompt, theory), model="gpt-4o-mini", temperature=0.2)
+    if result is not None:
+        return _dialogue_feedback(result, original_text)
+
+    return _dialogue_fallback(original_text, expected)
+
+
+_JSON_ESCAPES = {"n": "\n", "t": "\t", "r": "", "b": "", "f": "", "/": "/", "\\": "\\", '"': '"'}
+
+
+def _partial_json_string(text: str, field: str) -> str | None:
+    """Значение строкового поля из недописанного JSON (поток токенов): то, что уже пришло."""
+    match = re.search(rf'"{re.escape(field)}"\s*:\s*"', text)
+    if not match:
+        return None
+    out: list[str] = []
+    i = match.end()
+    while i < len(text):
+        c = text[i]
+        if c == '"':
             break
-        except Exception as e:
-            logger.warning("LLM dialogue error: %s", e)
-            if not use_json_mode:
+        if c == "\\":
+            if i + 1 >= len(text):
                 break
+            escaped = text[i + 1]
+            if escaped == "u":
+                if i + 6 > len(text):
+                    break
+                try:
+                    out.append(chr(int(text[i + 2:i + 6], 16)))
+                except ValueError:
+                    pass
+                i += 6
+                continue
+            out.append(_JSON_ESCAPES.get(escaped, escaped))
+            i += 2
+            continue
+        out.append(c)
+        i += 1
+    return "".join(out)
 
-    # Fallback при ошибке LLM (Connection error, timeout и т.п.)
-    if expected is not None:
-        expected_norm = normalize_spanish(expected)
-        if normalized_text == expected_norm:
-            return "✅ Верно!"
-        return f"❌ Неверно.\n👉 Правильно будет: {expected}"
-    return (
-        "⚠️ Проверка временно недоступна (ошибка связи с API). "
-        "Твой ответ принят — продолжай! Когда соединение восстановится, получишь развёрнутую обратную связь."
-    )
+
+_ERRORS_ARRAY_RE = re.compile(r'"errors"\s*:\s*\[')
+# Записи errors плоские (без вложенных объектов) — законченная запись целиком между { и }
+_ERROR_ENTRY_RE = re.compile(r"\{[^{}]*\}")
+
+
+def _partial_grading_text(text: str) -> str | None:
+    """Что показать из недописанного ответа по GRADING_SCHEMA: пришедшие ошибки или feedback."""
+    match = _ERRORS_ARRAY_RE.search(text)
+    if match:
+        errors = []
+        tail_start = match.end()
+        for entry in _ERROR_ENTRY_RE.finditer(text, match.end()):
+            tail_start = entry.end()
+            try:
+                error = _grading_error(json.loads(entry.group()))
+            except json.JSONDecodeError:
+                continue
+            if error is not None and _is_real_error(error):
+                errors.append(error)
+        lines = [_format_errors(errors)] if errors else []
+        # Запись, которая ещё пишется: показываем уже пришедшие поля
+        tail = text[tail_start:]
+        if "]" not in tail and "{" in tail:
+            original = _partial_json_string(tail, "original")
+            if original:
+                line = f"{len(errors) + 1}. [{_partial_json_string(tail, 'type') or ''}]: {original}"
+                corrected = _partial_json_string(tail, "corrected")
+                if corrected:
+                    line += f" → {corrected}"
+                lines.append(line if errors else f"Ошибки:\n{line}")
+        if lines:
+            return "\n".join(lines)
+    return _partial_json_string(text, "feedback")
+
+
+async def evaluate_dialogue_stream(
+    user_text: str,
+    prompt: str,
+    expected: str | None = None,
+    theory: str = "",
+    on_partial: Callable[[str], Awaitable[None]] | None = None,
+) -> tuple[bool, str]:
+    """
+    evaluate_dialogue с потоковой генерацией: on_partial получает уже пришедшие ошибки
+    (или похвалу) для правки сообщения, итог — (is_correct, feedback) по разобранному ответу.
+    Если поток не удался — обычная evaluate_dialogue.
+    """
+    client = _get_llm_client()
+    result = None
+    if client:
+        chunks: list[str] = []
+        shown = ""
+        usage = None
+        dialogue_prompt = _dialogue_prompt(user_text, prompt, theory)
+        try:
+            stream = await _chat(
+                client,
+                dialogue_prompt,
+                model="gpt-4o-mini",
+                temperature=0.2,
+                response_format=_grading_response_format(),
+                stream=True,
+            )
+            async for chunk in stream:
+                # include_usage: последний чанк без choices, с usage
+                usage = getattr(chunk, "usage", None) or usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                chunks.append(delta)
+                if on_partial is None:
+                    continue
+                partial = _partial_grading_text("".join(chunks))
+                if partial and partial != shown:
+                    shown = partial
+                    await on_partial(partial)
+            prompts.record_usage(dialogue_prompt, usage)
+            result = _grading_result("".join(chunks))
+            if result is None:
+                logger.warning("LLM dialogue stream: ответ не соответствует схеме: %s", "".join(chunks)[:200])
+        except Exception as e:
+            logger.warning("LLM dialogue stream error: %s", e)
+    if result is not None:
+        feedback = _dialogue_feedback(result, user_text)
+    else:
+        feedback = await evaluate_dialogue(user_text, prompt, expected=expected, theory=theory)
+    return not feedback.strip().startswith("❌"), feedback
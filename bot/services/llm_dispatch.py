@@ -0,0 +1,181 @@
+"""
+Диспетчер исходящих запросов к LLM/Whisper.
+
+Все вызовы API идут через dispatch(): общий семафор на процесс и семафор на модель
+ограничивают параллельность, token bucket — частоту запросов. Одинаковые запросы,
+пришедшие одновременно, выполняются один раз (общая задача на всех ожидающих).
+429, 5xx и сетевые ошибки повторяются с экспоненциальной задержкой со случайным
+разбросом (учитывается Retry-After). Очередь и время ожидания — dispatch_stats().
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from collections import Counter, deque
+from typing import Any, Awaitable, Callable, TypeVar
+
+try:
+    import openai
+    HAS_OPENAI = True
+except ImportError:
+    HAS_OPENAI = False
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MODEL_CONCURRENCY = int(os.getenv("LLM_MODEL_CONCURRENCY", "8"))
+# Token bucket: запросов в секунду и допустимый всплеск
+LLM_RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", "8"))
+LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", "16"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "10"))
+
+_WAIT_SAMPLES = 1000
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: int) -> None:
+        self._rate = rate
+        self._burst = max(burst, 1)
+        self._tokens = float(self._burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self._rate <= 0:
+            return
+        # Под замком — токены выдаются в порядке очереди
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+_global_slots = asyncio.Semaphore(max(LLM_MAX_CONCURRENCY, 1))
+_model_slots: dict[str, asyncio.Semaphore] = {}
+_bucket = _TokenBucket(LLM_RATE_LIMIT, LLM_RATE_BURST)
+_inflight: dict[str, asyncio.Task] = {}
+
+_stats: Counter = Counter()
+_queued = 0
+_max_queued = 0
+_running = 0
+_waits_ms: deque[float] = deque(maxlen=_WAIT_SAMPLES)
+
+
+def _model_semaphore(model: str) -> asyncio.Semaphore:
+    sem = _model_slots.get(model)
+    if sem is None:
+        sem = _model_slots[model] = asyncio.Semaphore(max(LLM_MODEL_CONCURRENCY, 1))
+    return sem
+
+
+def request_key(kind: str, **params: Any) -> str:
+    """Ключ для склейки одинаковых запросов: вид вызова + JSON-параметры."""
+    raw = json.dumps([kind, params], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _retry_delay(error: Exception, attempt: int) -> float | None:
+    """Сколько ждать перед повтором; None — ошибка не временная, повторять не нужно."""
+    if not HAS_OPENAI:
+        return None
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        pass
+    elif isinstance(error, openai.APIStatusError) and (error.status_code == 429 or error.status_code >= 500):
+        retry_after = error.response.headers.get("retry-after") if error.response is not None else None
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), LLM_RETRY_MAX_DELAY)
+        except ValueError:
+            pass
+    else:
+        return None
+    # Full jitter: случайная пауза в [0, base * 2^attempt]
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+async def _run(model: str, call: Callable[[], Awaitable[T]]) -> T:
+    global _queued, _max_queued, _running
+    attempt = 0
+    while True:
+        _queued += 1
+        _max_queued = max(_max_queued, _queued)
+        waiting = True
+        started = time.monotonic()
+        try:
+            async with _global_slots, _model_semaphore(model):
+                await _bucket.acquire()
+                waiting = False
+                _queued -= 1
+                _waits_ms.append((time.monotonic() - started) * 1000)
+                _running += 1
+                try:
+                    _stats["calls"] += 1
+                    return await call()
+                finally:
+                    _running -= 1
+        except Exception as e:
+            delay = _retry_delay(e, attempt)
+            if delay is None or attempt >= LLM_MAX_RETRIES:
+                _stats["failures"] += 1
+                raise
+            attempt += 1
+            _stats["retries"] += 1
+            logger.info("LLM %s: %s, повтор %d через %.2f с", model, type(e).__name__, attempt, delay)
+            await asyncio.sleep(delay)
+        finally:
+            if waiting:
+                # Отменён, не дождавшись слота
+                _queued -= 1
+
+
+async def dispatch(model: str, call: Callable[[], Awaitable[T]], key: str | None = None) -> T:
+    """
+    Выполняет call() с учётом лимитов и повторов.
+    key — ключ запроса (request_key): одновременные вызовы с одним ключом получают один результат.
+    """
+    if key is None:
+        return await _run(model, call)
+    task = _inflight.get(key)
+    if task is not None:
+        _stats["coalesced"] += 1
+    else:
+        task = asyncio.ensure_future(_run(model, call))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _finish_shared(key, t))
+    # shield: отмена одного ожидающего не отменяет общий запрос для остальных
+    return await asyncio.shield(task)
+
+
+def _finish_shared(key: str, task: asyncio.Task) -> None:
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    if not task.cancelled():
+        task.exception()  # помечаем исключение как полученное, если все ожидающие ушли
+
+
+def dispatch_stats() -> dict:
+    """Очередь, параллельность, повторы, склейки и время ожидания слота (мс)."""
+    waits = sorted(_waits_ms)
+    return {
+        **dict(_stats),
+        "queued": _queued,
+        "max_queued": _max_queued,
+        "running": _running,
+        "inflight_shared": len(_inflight),
+        "wait_ms_avg": round(sum(waits) / len(waits), 1) if waits else 0.0,
+        "wait_ms_p95": round(waits[min(int(len(waits) * 0.95), len(waits) - 1)], 1) if waits else 0.0,
+        "wait_ms_max": round(waits[-1], 1) if waits else 0.0,
+    }
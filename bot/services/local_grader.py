@@ -0,0 +1,133 @@
+"""
+Локальная проверка ответов до обращения к LLM.
+
+Очевидно верные ответы (точное или нормализованное совпадение, совпадение с допустимым
+вариантом упражнения) и очевидно неверные (мало общего с эталоном по редакционному
+расстоянию и по словам) решаются на месте. В LLM уходят только спорные случаи.
+Счётчики исходов — grader_stats().
+"""
+import re
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable
+
+# Ниже обоих порогов — ответ считается очевидно неверным
+WRONG_MAX_SIMILARITY = 0.45  # 1 - levenshtein / max(len)
+WRONG_MAX_TOKEN_OVERLAP = 0.25  # Жаккар по словам
+
+CORRECT = "correct"
+WRONG = "wrong"
+AMBIGUOUS = "ambiguous"
+
+# Без tu/el: после нормализации совпадают с притяжательным «tu» и артиклем «el»
+_SUBJECT_PRONOUNS = (
+    "yo", "ella", "usted", "nosotros", "nosotras",
+    "vosotros", "vosotras", "ellos", "ellas", "ustedes",
+)
+
+_stats: Counter = Counter()
+
+
+@dataclass(frozen=True)
+class LocalVerdict:
+    verdict: str  # CORRECT | WRONG | AMBIGUOUS
+    reason: str  # exact | normalized | variant | distance | empty | ambiguous
+
+
+def normalize_answer(text: str) -> str:
+    """normalize_spanish + ё→е и лишняя пунктуация (для русских ответов в повторениях)."""
+    from bot.services.llm import normalize_spanish
+
+    t = normalize_spanish(text or "").replace("ё", "е")
+    t = re.sub(r"[;—–\-\"«»()…]", " ", t)
+    return re.sub(r"\s+", " ", t).strip()
+
+
+@lru_cache(maxsize=4096)
+def _variants(expected: str, accepted: tuple[str, ...]) -> frozenset[str]:
+    """
+    Допустимые ответы упражнения в нормализованном виде (считаются один раз на упражнение).
+    Ученик может опустить местоимение-подлежащее («Yo vivo» → «Vivo»), но не заменить его:
+    «Ella es» ≠ «Yo es». Числительные не сворачиваются — uno/una различаются родом.
+    """
+    result: set[str] = set()
+    for answer in (expected, *accepted):
+        norm = normalize_answer(answer)
+        if not norm:
+            continue
+        result.add(norm)
+        first, _, rest = norm.partition(" ")
+        if rest and first in _SUBJECT_PRONOUNS:
+            result.add(rest)
+    return frozenset(result)
+
+
+def _levenshtein(a: str, b: str) -> int:
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        previous = current
+    return previous[-1]
+
+
+def _similarity(a: str, b: str) -> float:
+    longest = max(len(a), len(b))
+    if not longest:
+        return 1.0
+    # Расстояние не меньше разницы длин — если уже по длине ниже порога, не считаем
+    if min(len(a), len(b)) / longest < WRONG_MAX_SIMILARITY:
+        return min(len(a), len(b)) / longest
+    return 1.0 - _levenshtein(a, b) / longest
+
+
+def _token_overlap(a: str, b: str) -> float:
+    ta, tb = set(a.split()), set(b.split())
+    union = ta | tb
+    return len(ta & tb) / len(union) if union else 1.0
+
+
+def grade_locally(user_answer: str, expected: str, accepted: Iterable[str] = ()) -> LocalVerdict:
+    """Решает очевидные случаи без LLM; AMBIGUOUS — нужна проверка моделью."""
+    verdict = _grade(user_answer, expected, tuple(accepted or ()))
+    _stats[f"{verdict.verdict}_{verdict.reason}" if verdict.verdict != AMBIGUOUS else AMBIGUOUS] += 1
+    return verdict
+
+
+def _grade(user_answer: str, expected: str, accepted: tuple[str, ...]) -> LocalVerdict:
+    if (user_answer or "").strip() == (expected or "").strip():
+        return LocalVerdict(CORRECT, "exact")
+    user_norm = normalize_answer(user_answer)
+    if not user_norm:
+        return LocalVerdict(WRONG, "empty")
+    if user_norm == normalize_answer(expected):
+        return LocalVerdict(CORRECT, "normalized")
+    variants = _variants(expected or "", accepted)
+    if user_norm in variants:
+        return LocalVerdict(CORRECT, "variant")
+    if variants and all(
+        _token_overlap(user_norm, v) < WRONG_MAX_TOKEN_OVERLAP
+        and _similarity(user_norm, v) < WRONG_MAX_SIMILARITY
+        for v in variants
+    ):
+        return LocalVerdict(WRONG, "distance")
+    return LocalVerdict(AMBIGUOUS, "ambiguous")
+
+
+def grader_stats() -> dict:
+    """Сколько ответов решено локально (по причинам) и сколько ушло в LLM."""
+    total = sum(_stats.values())
+    local = total - _stats[AMBIGUOUS]
+    return {
+        **dict(_stats),
+        "total": total,
+        "local_share": round(local / total, 3) if total else 0.0,
+    }
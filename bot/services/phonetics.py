@@ -0,0 +1,273 @@
+"""
+Локальная фонетическая проверка голосовых ответов.
+
+Ожидаемая фраза и распознанный текст переводятся в фонемы по правилам испанского
+(ñ, ll, rr/r, j и g перед e/i, b = v, немая h, seseo) и выравниваются взвешенным
+редакционным расстоянием: замены из типичных ошибок (ñ→n, rr/r/l, ll/y, j/g, ударение)
+стоят меньше прочих. Совпадение по звучанию — верно; только типичные ошибки — неверно
+с разбором; сильное расхождение — неверно. Ударение сравнивается только в словах,
+где Whisper поставил акцент. В LLM уходят только пограничные случаи.
+Счётчики исходов — phonetics_stats().
+"""
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+
+from bot.services.local_grader import AMBIGUOUS, CORRECT, WRONG
+
+# Ниже этой доли совпадения фраза считается явно другой
+REJECT_BELOW = 0.5
+
+# Фонемы — по одному символу: ɾ одиночная r, r раскатистая, ʎ ll, ʝ y, ɲ ñ, x j, ʧ ch;
+# ударные гласные — á é í ó ú
+_VOWELS = set("aeiouáéíóú")
+_STRESS = {"á": "a", "é": "e", "í": "i", "ó": "o", "ú": "u"}
+
+_SIMPLE = {
+    "b": "b", "v": "b", "d": "d", "f": "f", "k": "k", "l": "l", "m": "m", "n": "n",
+    "ñ": "ɲ", "p": "p", "s": "s", "z": "s", "t": "t", "w": "w", "j": "x",
+}
+
+_DIGITS = {
+    "0": "cero", "1": "uno", "2": "dos", "3": "tres", "4": "cuatro", "5": "cinco", "6": "seis",
+    "7": "siete", "8": "ocho", "9": "nueve", "10": "diez", "11": "once", "12": "doce",
+}
+
+# Типичные ошибки (пары фонем) → стоимость замены и вид ошибки
+_TYPICAL = {
+    frozenset("ɲn"): (0.5, "ñ"),
+    frozenset("rɾ"): (0.5, "rr"),
+    frozenset("ɾl"): (0.6, "r_l"),
+    frozenset("rl"): (0.6, "r_l"),
+    frozenset("ʎʝ"): (0.4, "ll"),
+    frozenset("xg"): (0.5, "j_g"),
+    **{frozenset((stressed, plain)): (0.3, "stress") for stressed, plain in _STRESS.items()},
+}
+
+_FEEDBACK = {
+    "ñ": "«ñ» в слове «{word}» — отдельный звук [нь], не «н».",
+    "rr": "В слове «{word}»: «rr» и «r» в начале слова — раскатистый звук, одиночная «r» между гласными — один удар.",
+    "r_l": "В слове «{word}» различай «r» и «l».",
+    "ll": "«ll» в слове «{word}» — отдельный звук, не «y».",
+    "j_g": "В слове «{word}» «j» и «g» перед e/i читаются как [х].",
+    "stress": "Ударение в слове «{word}» — на «{sound}».",
+    "stress_extra": "Проверь ударение в слове «{word}».",
+}
+
+_stats: Counter = Counter()
+
+
+@dataclass(frozen=True)
+class PhoneticError:
+    kind: str  # ключ _FEEDBACK
+    word: str  # слово ожидаемой фразы
+    sound: str  # ожидаемая фонема
+
+
+@dataclass(frozen=True)
+class PhoneticScore:
+    verdict: str  # CORRECT | WRONG | AMBIGUOUS
+    reason: str  # exact | typical | distance | ambiguous
+    score: float  # 1 - расстояние / длина
+    errors: tuple[PhoneticError, ...]
+    feedback: str
+
+
+def _words(text: str) -> list[str]:
+    t = unicodedata.normalize("NFC", (text or "").lower())
+    t = re.sub(r"[^\w\s]", " ", t.replace("-", " "))
+    return [_DIGITS.get(w, w) for w in t.split()]
+
+
+def _word_phonemes(word: str) -> list[str]:
+    """Графемы слова → фонемы (нейтральный латиноамериканский вариант, seseo)."""
+    out: list[str] = []
+    i, n = 0, len(word)
+    while i < n:
+        ch = word[i]
+        nxt = word[i + 1] if i + 1 < n else ""
+        after = word[i + 2] if i + 2 < n else ""
+        if ch in _VOWELS:
+            out.append(ch)
+        elif ch == "ü":
+            out.append("w")
+        elif ch == "h":
+            pass
+        elif ch == "c":
+            if nxt == "h":
+                out.append("ʧ")
+                i += 1
+            else:
+                out.append("s" if nxt in "eiéí" else "k")
+        elif ch == "q":
+            out.append("k")
+            if nxt == "u" and after in "eiéí":
+                i += 1
+        elif ch == "g":
+            if nxt in "eiéí":
+                out.append("x")
+            else:
+                out.append("g")
+                if nxt == "u" and after in "eiéí":
+                    i += 1
+        elif ch == "l":
+            if nxt == "l":
+                out.append("ʎ")
+                i += 1
+            else:
+                out.append("l")
+        elif ch == "r":
+            if nxt == "r":
+                out.append("r")
+                i += 1
+            else:
+                out.append("r" if i == 0 or word[i - 1] in "nls" else "ɾ")
+        elif ch == "y":
+            out.append("i" if i == n - 1 else "ʝ")
+        elif ch == "x":
+            out.extend("ks")
+        elif ch in _SIMPLE:
+            out.append(_SIMPLE[ch])
+        elif ch.isalpha():
+            out.append(ch)
+        i += 1
+    return out
+
+
+def to_phonemes(text: str) -> list[tuple[str, int]]:
+    """Фраза → [(фонема, номер слова)]; границы слов не учитываются («a ver» = «haber»)."""
+    return [(p, idx) for idx, word in enumerate(_words(text)) for p in _word_phonemes(word)]
+
+
+# (фонема эталона, услышанная фонема) → (стоимость, вид)
+_PAIRS = {
+    (a, b): value
+    for pair, value in _TYPICAL.items()
+    for a, b in (tuple(pair), tuple(pair)[::-1])
+}
+
+_COSTS = {key: cost for key, (cost, _) in _PAIRS.items()}
+
+
+def _substitution(a: str, b: str) -> tuple[float, str | None]:
+    if a == b:
+        return 0.0, None
+    return _PAIRS.get((a, b), (1.0, ""))
+
+
+def _align(expected: list[str], heard: list[str]) -> tuple[float, list[tuple[int, int, str]]]:
+    """
+    Взвешенное расстояние и расхождения: [(позиция в expected, позиция в heard, вид)],
+    вид "" — не типичная ошибка или пропуск/лишний звук.
+    """
+    # Общие начало и конец не влияют на расстояние — считаем только середину
+    start = 0
+    while start < len(expected) and start < len(heard) and expected[start] == heard[start]:
+        start += 1
+    end = 0
+    while (
+        end < len(expected) - start and end < len(heard) - start
+        and expected[-1 - end] == heard[-1 - end]
+    ):
+        end += 1
+    exp_mid = expected[start:len(expected) - end]
+    heard_mid = heard[start:len(heard) - end]
+
+    n, m = len(exp_mid), len(heard_mid)
+    dist = [[float(j) for j in range(m + 1)]]
+    for i, a in enumerate(exp_mid, 1):
+        prev = dist[-1]
+        costs = [0.0 if a == b else _COSTS.get((a, b), 1.0) for b in heard_mid]
+        left = float(i)
+        row = [left]
+        for j in range(m):
+            best = prev[j] + costs[j]
+            if prev[j + 1] + 1 < best:
+                best = prev[j + 1] + 1
+            if left + 1 < best:
+                best = left + 1
+            row.append(best)
+            left = best
+        dist.append(row)
+
+    errors: list[tuple[int, int, str]] = []
+    i, j = n, m
+    while i or j:
+        if i and j:
+            cost, kind = _substitution(exp_mid[i - 1], heard_mid[j - 1])
+            if dist[i][j] == dist[i - 1][j - 1] + cost:
+                if kind is not None:
+                    errors.append((start + i - 1, start + j - 1, kind))
+                i, j = i - 1, j - 1
+                continue
+        if i and dist[i][j] == dist[i - 1][j] + 1:
+            errors.append((start + i - 1, min(start + j, len(heard) - 1), ""))
+            i -= 1
+        else:
+            # Лишний звук — относим к ближайшей фонеме эталона
+            errors.append((min(start + max(i - 1, 0), len(expected) - 1), start + j - 1, ""))
+            j -= 1
+    errors.reverse()
+    return dist[n][m], errors
+
+
+def score_pronunciation(expected: str, recognized: str) -> PhoneticScore:
+    """Сравнивает ожидаемую фразу с распознанной по звучанию; AMBIGUOUS — нужна LLM."""
+    result = _score(expected, recognized)
+    _stats[f"{result.verdict}_{result.reason}" if result.verdict != AMBIGUOUS else AMBIGUOUS] += 1
+    return result
+
+
+def _score(expected: str, recognized: str) -> PhoneticScore:
+    exp = to_phonemes(expected)
+    heard = to_phonemes(recognized)
+    if not heard:
+        return PhoneticScore(WRONG, "distance", 0.0, (), "Не удалось разобрать ответ. Попробуй произнести фразу ещё раз.")
+    exp_phonemes = [p for p, _ in exp]
+    heard_phonemes = [p for p, _ in heard]
+    if exp_phonemes == heard_phonemes:
+        return PhoneticScore(CORRECT, "exact", 1.0, (), "Отлично!")
+
+    distance, diffs = _align(exp_phonemes, heard_phonemes)
+    score = max(0.0, 1.0 - distance / max(len(exp_phonemes), len(heard_phonemes), 1))
+    exp_words = _words(expected)
+    heard_words = _words(recognized)
+    errors: list[PhoneticError] = []
+    for exp_pos, heard_pos, kind in diffs:
+        if kind == "stress" and not any(ch in _STRESS for ch in heard_words[heard[heard_pos][1]]):
+            # Whisper ставит акценты непоследовательно: слово без акцента об ударении ничего не говорит
+            continue
+        if kind == "stress" and exp_phonemes[exp_pos] not in _STRESS:
+            kind = "stress_extra"  # в эталоне гласная безударная
+        errors.append(PhoneticError(
+            kind,
+            exp_words[exp[exp_pos][1]] if exp else "",
+            exp_phonemes[exp_pos] if exp else "",
+        ))
+
+    if errors and all(e.kind for e in errors):
+        # Не больше двух замечаний, по одному на вид ошибки
+        first: dict[str, PhoneticError] = {}
+        for e in errors:
+            first.setdefault(e.kind, e)
+        feedback = " ".join(_FEEDBACK[e.kind].format(word=e.word, sound=e.sound) for e in list(first.values())[:2])
+        return PhoneticScore(WRONG, "typical", score, tuple(errors), feedback)
+    if score < REJECT_BELOW:
+        return PhoneticScore(
+            WRONG, "distance", score, tuple(errors),
+            "Фраза заметно отличается от ожидаемой. Послушай пример и попробуй ещё раз.",
+        )
+    # Прочие расхождения и ударение в словах без акцента — решает LLM
+    return PhoneticScore(AMBIGUOUS, "ambiguous", score, tuple(errors), "")
+
+
+def phonetics_stats() -> dict:
+    """Сколько голосовых ответов решено локально (по причинам) и сколько ушло в LLM."""
+    total = sum(_stats.values())
+    local = total - _stats[AMBIGUOUS]
+    return {
+        **dict(_stats),
+        "total": total,
+        "local_share": round(local / total, 3) if total else 0.0,
+    }
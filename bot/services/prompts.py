@@ -0,0 +1,248 @@
+"""
+Сборка промптов для проверок через LLM.
+
+Статическая часть (инструкции, формат ответа) всегда идёт первой и не меняется
+между запросами одного вида — провайдер может кэшировать этот префикс; данные
+ученика — только в последнем сообщении. Для каждого вида упражнения — свой
+компактный вариант инструкций. Входные токены и взятые провайдером из кэша —
+по usage ответа, prompt_stats().
+"""
+import hashlib
+import logging
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# prompt_cache_key в запросе: запросы с одним префиксом попадают в один кэш провайдера
+LLM_PROMPT_CACHE_KEY = os.getenv("LLM_PROMPT_CACHE_KEY", "0").strip().lower() in ("1", "true", "yes")
+
+FILL_TEXT = "fill_text"
+DIALOGUE = "dialogue"
+VOICE = "voice"
+TRANSLATION = "translation"
+TRANSLATION_BATCH = "translation_batch"
+
+_NOT_ERRORS = (
+    "НЕ ОШИБКА (не включай в errors): n вместо ñ и отсутствие акцентов (manana = mañana, Como = Cómo) — "
+    "это ввод с английской клавиатуры, а не орфография; отсутствие ¿¡ (Como estas? = ¿Cómo estás?); "
+    "заглавная после . ! ? — начало нового предложения. Если отличие только в этом — ответ верный."
+)
+
+ERROR_TYPES = ("Орфография", "Согласование рода", "Спряжение", "Артикль/предлог", "Смысл")
+
+_GRADING_FORMAT = (
+    "ОТВЕТ — JSON: correct (true/false); errors — список ошибок, у каждой type (тип из списка), "
+    "original (как написал ученик), corrected (исправление), explanation (кратко, по-русски); "
+    "corrected_text — полный эталонный испанский текст (если ответ верный — пустая строка); "
+    "feedback — одна фраза по-русски (если ответ верный — похвала)."
+)
+
+# Ответ проверки fill_text/dialogue (structured output, strict: все поля обязательны)
+GRADING_SCHEMA = {
+    "name": "grading",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "correct": {"type": "boolean"},
+            "errors": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "type": {"type": "string", "enum": list(ERROR_TYPES)},
+                        "original": {"type": "string"},
+                        "corrected": {"type": "string"},
+                        "explanation": {"type": "string"},
+                    },
+                    "required": ["type", "original", "corrected", "explanation"],
+                    "additionalProperties": False,
+                },
+            },
+            "corrected_text": {"type": "string"},
+            "feedback": {"type": "string"},
+        },
+        "required": ["correct", "errors", "corrected_text", "feedback"],
+        "additionalProperties": False,
+    },
+}
+
+_FILL_TEXT_SYSTEM = (
+    "Ты — преподаватель испанского. Ученик вставляет пропущенное слово; сравни его ответ с правильным. "
+    "Отвечай ТОЛЬКО валидным JSON.\n\n"
+    + _NOT_ERRORS + "\n\n"
+    "ТИПЫ ОШИБОК: Орфография (опечатка), Согласование рода, Спряжение, Артикль/предлог. "
+    "Каждая ошибка — реальное исправление (original ≠ corrected).\n\n"
+    + _GRADING_FORMAT
+)
+
+_DIALOGUE_SYSTEM = (
+    "Ты — преподаватель испанского. Проверяй ответ ученика по правилам испанской грамматики и контексту "
+    "урока (если передан). Отвечай ТОЛЬКО валидным JSON.\n\n"
+    + _NOT_ERRORS + "\n\n"
+    "ТИПЫ ОШИБОК (не придумывай; каждая — реальное исправление, original ≠ corrected):\n"
+    "- Орфография: опечатка, лишняя/пропущенная буква (professora → profesora);\n"
+    "- Согласование рода: неверный род (о madre — profesora, не profesor);\n"
+    "- Спряжение: ошибка в глаголе (soy → es, tiene → tienen), ser/estar, tener;\n"
+    "- Артикль/предлог: el/la/un/una, en/de и т.д.;\n"
+    "- Смысл: объективно не хватает слова («vi en el cine» → «vi una película en el cine»). "
+    "Возвратные глаголы (me levanto, me lavo, me visto, me ducho) и ir/llegar самодостаточны; "
+    "перечисление действий через запятую корректно.\n\n"
+    "«Ответ ученика (оригинал)» — то, что ученик реально написал: не указывай ошибку, если там уже правильно. "
+    "corrected_text — с акцентами, ñ, ¿¡, включая недостающие по смыслу слова.\n\n"
+    + _GRADING_FORMAT
+)
+
+_VOICE_SYSTEM = (
+    "Ты — преподаватель испанского. Оцени голосовой ответ ученика по распознанному тексту (Whisper): "
+    "расхождение с ожидаемой фразой указывает на ошибку произношения или грамматики.\n\n"
+    "Правила произношения: чёткие гласные a, e, i, o, u без редукции, ударение на нужном слоге; "
+    "ñ — отдельный звук; r/rr/l различаются; j [x]; ll; v/b. Типичные ошибки в транскрипции: "
+    "v/b, r/rr/l, ll/y, j/g, ñ→n, неверное ударение.\n\n"
+    "При ошибке feedback_ru — 1–2 предложения на русском: грамматика — тип ([Спряжение], [Артикль/предлог]) "
+    "и правило; произношение — какой звук/слог неверен и как должно быть.\n\n"
+    'Ответь ТОЛЬКО валидным JSON: {"correct": true/false, "feedback_ru": "...", "corrected": "эталонная фраза"}'
+)
+
+_TRANSLATION_RULES = (
+    "Принимай (да): опущение местоимений (Живем = Мы живём), синонимы, разную пунктуацию, отсутствие акцентов/ñ.\n\n"
+    "Отклоняй (нет): грамматические ошибки — неправильное согласование рода/числа "
+    "(buenos noches → неверно, правильно buenas noches), неправильные артикли, спряжения, "
+    "опечатки, меняющие смысл."
+)
+
+_TRANSLATION_SYSTEM = (
+    "Сравни ответ ученика с эталонным переводом испанского текста: эквивалентен ли он эталону?\n\n"
+    + _TRANSLATION_RULES
+    + " Ответь ТОЛЬКО да или нет."
+)
+
+# Пары передаются JSON-списком в сообщении пользователя
+_TRANSLATION_BATCH_SYSTEM = (
+    "Пользователь передаёт JSON-список проверок: id, исходный текст на испанском (spanish), эталонный ответ "
+    "(expected) и ответ ученика (answer). Для каждой проверки реши, эквивалентен ли ответ ученика эталону.\n\n"
+    + _TRANSLATION_RULES
+    + "\n\nВерни для каждого id поле equivalent (true/false)."
+)
+
+TRANSLATION_BATCH_SCHEMA = {
+    "name": "translation_checks",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "results": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "integer"},
+                        "equivalent": {"type": "boolean"},
+                    },
+                    "required": ["id", "equivalent"],
+                    "additionalProperties": False,
+                },
+            },
+        },
+        "required": ["results"],
+        "additionalProperties": False,
+    },
+}
+
+_SYSTEMS = {
+    FILL_TEXT: _FILL_TEXT_SYSTEM,
+    DIALOGUE: _DIALOGUE_SYSTEM,
+    VOICE: _VOICE_SYSTEM,
+    TRANSLATION: _TRANSLATION_SYSTEM,
+    TRANSLATION_BATCH: _TRANSLATION_BATCH_SYSTEM,
+}
+
+
+def version(kind: str) -> str:
+    """Версия статической части промпта (входит в ключ кэша проверок)."""
+    return hashlib.sha1(_SYSTEMS[kind].encode("utf-8")).hexdigest()[:8]
+
+
+@dataclass(frozen=True)
+class Prompt:
+    kind: str
+    messages: list[dict]
+
+    def request_options(self) -> dict:
+        options: dict = {"messages": self.messages}
+        if LLM_PROMPT_CACHE_KEY:
+            options["prompt_cache_key"] = f"{self.kind}:{version(self.kind)}"
+        return options
+
+
+def _build(kind: str, user_content: str) -> Prompt:
+    return Prompt(kind, [
+        {"role": "system", "content": _SYSTEMS[kind]},
+        {"role": "user", "content": user_content},
+    ])
+
+
+def fill_text_prompt(expected: str, original: str, normalized: str) -> Prompt:
+    return _build(FILL_TEXT, (
+        f"Правильный ответ: {expected}\n"
+        f"Ответ ученика (оригинал): {original}\n"
+        f"Ответ ученика (нормализован): {normalized}"
+    ))
+
+
+def dialogue_prompt(task: str, theory: str, original: str, normalized: str) -> Prompt:
+    content = f"Задание: {task}\n\n"
+    if theory:
+        content += f"Контекст урока (опирайся на эти правила): {theory}\n\n"
+    content += f"Ответ ученика (оригинал): {original}\nОтвет ученика (нормализован): {normalized}"
+    return _build(DIALOGUE, content)
+
+
+def voice_prompt(expected: str, recognized: str) -> Prompt:
+    return _build(VOICE, f"Ожидаемая фраза: {expected}\nРаспознанный текст (Whisper): {recognized}")
+
+
+def translation_prompt(spanish: str, expected: str, answer: str) -> Prompt:
+    return _build(TRANSLATION, (
+        f"Исходный текст на испанском: {spanish}\n"
+        f"Эталонный ответ: {expected}\n"
+        f"Ответ ученика: {answer}"
+    ))
+
+
+def translation_batch_prompt(payload_json: str) -> Prompt:
+    return _build(TRANSLATION_BATCH, payload_json)
+
+
+_stats: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+
+def record_usage(prompt: Prompt, usage) -> None:
+    """Учитывает usage ответа: входные токены и сколько из них провайдер взял из кэша."""
+    stats = _stats[prompt.kind]
+    stats["calls"] += 1
+    if usage is None:
+        # Прокси не вернул usage — не подставляем оценку вместо измерения
+        stats["calls_without_usage"] += 1
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+    stats["prompt_tokens"] += prompt_tokens
+    stats["cached_tokens"] += cached_tokens
+    logger.debug("Промпт %s: %d токенов (из кэша %d)", prompt.kind, prompt_tokens, cached_tokens)
+
+
+def prompt_stats() -> dict[str, dict]:
+    """По видам промптов: вызовы, входные токены и из кэша (по usage ответов), среднее на вызов."""
+    result = {}
+    for kind, stats in _stats.items():
+        measured = (stats["calls"] - stats["calls_without_usage"]) or 1
+        result[kind] = {
+            **stats,
+            "prompt_tokens_avg": round(stats["prompt_tokens"] / measured),
+            "cached_share": round(stats["cached_tokens"] / stats["prompt_tokens"], 3) if stats["prompt_tokens"] else 0.0,
+        }
+    return result
@@ -1,16 +1,27 @@
 """Сервис повторения ошибок (spaced repetition lite)."""
+import asyncio
+import logging
+import os
 import re
 
 from bot.db.review_repo import (
     add_review_item,
+    count_due_reviews,
     get_due_reviews,
     remove_review_item,
     update_review_interval,
 )
 
+logger = logging.getLogger(__name__)
+
 # Прогрессия интервалов: 1 -> 3 -> 7 -> 14 -> удалить
 INTERVALS = [1, 3, 7, 14]
 
+# Проверки перевода по смыслу копятся TRANSLATION_BATCH_WINDOW сек (или до
+# TRANSLATION_BATCH_SIZE штук) и уходят в LLM одним запросом
+TRANSLATION_BATCH_WINDOW = float(os.getenv("TRANSLATION_BATCH_WINDOW", "0.3"))
+TRANSLATION_BATCH_SIZE = int(os.getenv("TRANSLATION_BATCH_SIZE", "10"))
+
 
 async def add_mistake(
     telegram_id: int,
@@ -41,6 +52,11 @@ async def get_due_review_items(telegram_id: int, limit: int | None = None) -> li
     return await get_due_reviews(telegram_id, limit=limit)
 
 
+async def count_due_review_items(telegram_id: int, cap: int | None = None) -> int:
+    """Количество элементов к повторению (без загрузки самих элементов)."""
+    return await count_due_reviews(telegram_id, cap=cap)
+
+
 def _normalize_answer(text: str) -> str:
     """Нормализация для сравнения: lower, strip, убрать пунктуацию, тире."""
     if not text:
@@ -71,6 +87,106 @@ async def is_translation_semantically_correct(
     return await check_translation_equivalent(user_answer, expected_answer, spanish_content)
 
 
+_batch: list[tuple[tuple[str, str, str], asyncio.Future]] = []
+_batch_timer: asyncio.TimerHandle | None = None
+# telegram_id -> фоновые проверки текущей сессии повторений
+_pending_checks: dict[int, list[asyncio.Task]] = {}
+# Сильные ссылки на фоновые задачи, пока они не завершатся
+_background: set[asyncio.Task] = set()
+
+
+def _flush_batch() -> None:
+    global _batch_timer
+    if _batch_timer is not None:
+        _batch_timer.cancel()
+        _batch_timer = None
+    if not _batch:
+        return
+    batch = _batch[:]
+    _batch.clear()
+    task = asyncio.get_running_loop().create_task(_grade_batch(batch))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def _grade_batch(batch: list[tuple[tuple[str, str, str], asyncio.Future]]) -> None:
+    from bot.services.llm import check_translations_batch
+
+    try:
+        results = await check_translations_batch([triple for triple, _ in batch])
+    except Exception as e:
+        logger.warning("Пакетная проверка переводов: %s", e)
+        results = [False] * len(batch)
+    for (_, future), ok in zip(batch, results):
+        if not future.done():
+            future.set_result(ok)
+
+
+async def check_translation_batched(user_answer: str, expected_answer: str, spanish_content: str) -> bool:
+    """is_translation_semantically_correct, но одновременные проверки уходят в LLM одним запросом."""
+    global _batch_timer
+    future = asyncio.get_running_loop().create_future()
+    _batch.append(((user_answer, expected_answer, spanish_content), future))
+    if len(_batch) >= TRANSLATION_BATCH_SIZE or TRANSLATION_BATCH_WINDOW <= 0:
+        _flush_batch()
+    elif _batch_timer is None:
+        _batch_timer = asyncio.get_running_loop().call_later(TRANSLATION_BATCH_WINDOW, _flush_batch)
+    return await future
+
+
+async def _grade_in_background(review_item_id: int, user_answer: str, expected_answer: str, content: str) -> dict:
+    from bot.db.review_repo import get_review_item_by_id
+
+    correct = await check_translation_batched(user_answer, expected_answer, content)
+    review_item = await get_review_item_by_id(review_item_id)
+    if review_item:
+        await process_review_answer(review_item, correct)
+    return {"content": content, "answer": user_answer, "expected": expected_answer, "correct": correct}
+
+
+def prefetch_translation_check(
+    telegram_id: int,
+    review_item_id: int,
+    user_answer: str,
+    expected_answer: str,
+    spanish_content: str,
+) -> None:
+    """
+    Запускает проверку по смыслу в фоне (и обновление интервала карточки по её итогу),
+    чтобы сразу показать следующую карточку. Итоги — collect_pending_checks().
+    """
+    task = asyncio.get_running_loop().create_task(
+        _grade_in_background(review_item_id, user_answer, expected_answer, spanish_content)
+    )
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    _pending_checks.setdefault(telegram_id, []).append(task)
+
+
+def forget_pending_checks(telegram_id: int) -> None:
+    """Сессия прервана: фоновые проверки доработают (интервалы обновятся), но итог не показываем."""
+    _pending_checks.pop(telegram_id, None)
+
+
+async def collect_pending_checks(telegram_id: int) -> list[dict]:
+    """
+    Дожидается фоновых проверок сессии пользователя.
+    Возвращает [{content, answer, expected, correct}] в порядке ответов.
+    """
+    tasks = _pending_checks.pop(telegram_id, [])
+    if not tasks:
+        return []
+    # Не ждём окна пакета: сессия закончилась, новых ответов не будет
+    _flush_batch()
+    results = []
+    for outcome in await asyncio.gather(*tasks, return_exceptions=True):
+        if isinstance(outcome, Exception):
+            logger.warning("Фоновая проверка перевода: %s", outcome)
+            continue
+        results.append(outcome)
+    return results
+
+
 async def process_review_answer(review_item, is_correct: bool) -> bool:
     """
     Обрабатывает ответ пользователя.
@@ -1,23 +1,245 @@
 """
-Сервис распознавания речи (Whisper) через OpenAI API.
+Сервис распознавания речи: OpenAI API или локальная модель (faster-whisper).
+
+Голосовое скачивается из Telegram в буфер в памяти и сразу уходит в распознавание — без
+записи во временный файл. Только записи больше VOICE_MEMORY_LIMIT байт сбрасываются на диск
+(SpooledTemporaryFile). Повторно присланные голосовые берутся из кэша без скачивания
+(recognize_voice). Объём, время, попадания в кэш — voice_stats().
+
+Бэкенд задаётся STT_BACKEND: openai (по умолчанию) или local. Локальная модель работает
+в пуле процессов (по модели на процесс) и не требует ключа API; preload_stt() при старте
+загружает её и прогревает, чтобы первое голосовое не ждало загрузки.
 """
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO
+
+from aiogram import Bot
+from aiogram.types import Voice
+
+from bot.services import stt_local
+from bot.services.cache import transcription_cache
 from bot.services.llm import _get_llm_client
+from bot.services.llm_dispatch import dispatch
 
+logger = logging.getLogger(__name__)
 
-async def transcribe_voice(file_path: str) -> str:
-    """
-    Транскрибирует голосовой файл через OpenAI Whisper (speech-to-text).
-    Возвращает распознанный текст или пустую строку при ошибке.
-    """
+_STT_MODEL = "gpt-4o-mini-transcribe"
+
+# Голосовые до этого размера держим в памяти; обычное сообщение на минуту — около 100–200 КБ
+VOICE_MEMORY_LIMIT = int(os.getenv("VOICE_MEMORY_LIMIT", str(4 * 1024 * 1024)))
+
+STT_BACKEND = os.getenv("STT_BACKEND", "openai").strip().lower()
+STT_LOCAL_MODEL = os.getenv("STT_LOCAL_MODEL", "small")
+STT_LOCAL_COMPUTE_TYPE = os.getenv("STT_LOCAL_COMPUTE_TYPE", "int8")
+STT_LOCAL_WORKERS = int(os.getenv("STT_LOCAL_WORKERS", "1"))
+# Потоков на процесс-воркер (0 — по умолчанию библиотеки)
+STT_LOCAL_THREADS = int(os.getenv("STT_LOCAL_THREADS", "0"))
+
+OPENAI = "openai"
+LOCAL = "local"
+
+_local_pool: ProcessPoolExecutor | None = None
+_stats: Counter = Counter()
+
+
+async def download_voice(bot: Bot, voice: Voice) -> BinaryIO:
+    """Скачивает голосовое в буфер (в памяти до VOICE_MEMORY_LIMIT); позиция — в начале."""
+    started = time.monotonic()
+    buffer = SpooledTemporaryFile(max_size=VOICE_MEMORY_LIMIT)
+    await bot.download(voice, destination=buffer)
+    size = buffer.seek(0, os.SEEK_END)
+    buffer.seek(0)
+    elapsed_ms = (time.monotonic() - started) * 1000
+
+    # SpooledTemporaryFile уходит на диск, только когда запись превысила max_size
+    in_memory = size <= VOICE_MEMORY_LIMIT
+    _stats["messages"] += 1
+    _stats["download_ms"] += elapsed_ms
+    if in_memory:
+        _stats["in_memory"] += 1
+        _stats["bytes_in_memory"] += size
+    else:
+        _stats["spilled"] += 1
+    # Экономию в мс не считаем: без временного файла сравнивать не с чем — только байты мимо диска
+    logger.info(
+        "Голосовое %s: %d байт %s, загрузка в буфер %.0f мс",
+        voice.file_unique_id, size, "не записано на диск" if in_memory else "сброшено на диск", elapsed_ms,
+    )
+    return buffer
+
+
+@lru_cache(maxsize=None)
+def _backend() -> str:
+    if STT_BACKEND == LOCAL and not stt_local.HAS_FASTER_WHISPER:
+        logger.warning("STT_BACKEND=local, но faster-whisper не установлен — распознаю через OpenAI")
+        return OPENAI
+    return LOCAL if STT_BACKEND == LOCAL else OPENAI
+
+
+def _get_local_pool() -> ProcessPoolExecutor:
+    global _local_pool
+    if _local_pool is None:
+        # spawn: воркеры не наследуют цикл событий и соединения бота
+        _local_pool = ProcessPoolExecutor(
+            max_workers=max(STT_LOCAL_WORKERS, 1),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=stt_local.init_worker,
+            initargs=(STT_LOCAL_MODEL, STT_LOCAL_COMPUTE_TYPE, STT_LOCAL_THREADS),
+        )
+    return _local_pool
+
+
+async def _transcribe_openai(audio: BinaryIO, filename: str) -> str:
     client = _get_llm_client()
     if not client:
         return ""
 
-    with open(file_path, "rb") as f:
-        transcript = await client.audio.transcriptions.create(
-            model="gpt-4o-mini-transcribe",
-            file=f,
+    async def call():
+        # При повторе буфер читается с начала
+        audio.seek(0)
+        return await client.audio.transcriptions.create(
+            model=_STT_MODEL,
+            file=(filename, audio),
             language="es",  # Испанский — чтобы не транскрибировать в русскую транскрипцию
         )
 
+    transcript = await dispatch(_STT_MODEL, call)
     return (transcript.text or "").strip()
+
+
+async def _transcribe_local(audio: BinaryIO, filename: str) -> str:
+    audio.seek(0)
+    data = audio.read()
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_local_pool(), stt_local.transcribe, data)
+    except BrokenProcessPool:
+        # Воркер упал (например, не хватило памяти) — следующий вызов поднимет пул заново
+        close_stt()
+        raise
+
+
+_BACKENDS = {
+    OPENAI: _transcribe_openai,
+    LOCAL: _transcribe_local,
+}
+
+
+async def preload_stt(backend: str | None = None) -> None:
+    """Для локального бэкенда: поднимает воркеры, загружает модель и прогревает её."""
+    if (backend or _backend()) != LOCAL:
+        return
+    started = time.monotonic()
+    pool = _get_local_pool()
+    loop = asyncio.get_running_loop()
+    # Одновременные задачи разбираются разными процессами — прогреваются все воркеры
+    try:
+        await asyncio.gather(*(
+            loop.run_in_executor(pool, stt_local.warm_up) for _ in range(max(STT_LOCAL_WORKERS, 1))
+        ))
+    except Exception as e:
+        logger.exception("Не удалось загрузить локальную модель распознавания: %s", e)
+        return
+    logger.info(
+        "Локальное распознавание: модель %s (%s), воркеров %d, загрузка %.1f с",
+        STT_LOCAL_MODEL, STT_LOCAL_COMPUTE_TYPE, STT_LOCAL_WORKERS, time.monotonic() - started,
+    )
+
+
+def close_stt() -> None:
+    global _local_pool
+    if _local_pool is not None:
+        _local_pool.shutdown(cancel_futures=True)
+        _local_pool = None
+
+
+async def transcribe_voice(audio: BinaryIO, filename: str = "voice.ogg", backend: str | None = None) -> str:
+    """
+    Транскрибирует голосовое (speech-to-text) выбранным бэкендом (по умолчанию — STT_BACKEND).
+    audio — буфер с записью (download_voice); filename нужен API для определения формата.
+    Возвращает распознанный текст; пустая строка — речь не распознана или нет ключа API.
+    Ошибки API и пула процессов не перехватываются — их обрабатывает вызывающий (handle_voice).
+    """
+    started = time.monotonic()
+    text = await _BACKENDS[backend or _backend()](audio, filename)
+    _stats["transcriptions"] += 1
+    _stats["transcribe_ms"] += (time.monotonic() - started) * 1000
+    return text
+
+
+def _engine() -> str:
+    """Чем распознаём: смена модели не должна отдавать старые результаты из кэша."""
+    return f"{LOCAL}:{STT_LOCAL_MODEL}" if _backend() == LOCAL else f"{OPENAI}:{_STT_MODEL}"
+
+
+def _content_hash(audio: BinaryIO) -> str:
+    digest = hashlib.sha256()
+    audio.seek(0)
+    for chunk in iter(lambda: audio.read(65536), b""):
+        digest.update(chunk)
+    audio.seek(0)
+    return digest.hexdigest()
+
+
+async def recognize_voice(bot: Bot, voice: Voice) -> str:
+    """
+    Текст голосового с кэшем: повторно присланное (или пересланное) голосовое
+    узнаётся по file_unique_id без скачивания; тот же звук под другим id — по хэшу.
+    Пустой результат не кэшируется: после «не удалось распознать» пробуем заново.
+    """
+    engine = _engine()
+    id_key = ("file", engine, voice.file_unique_id)
+    text = await transcription_cache.get(id_key)
+    if text is not None:
+        _stats["cache_hits_file"] += 1
+        return text
+
+    audio = await download_voice(bot, voice)
+    try:
+        hash_key = ("sha256", engine, _content_hash(audio))
+        text = await transcription_cache.get(hash_key)
+        if text is not None:
+            _stats["cache_hits_hash"] += 1
+        else:
+            text = await transcribe_voice(audio)
+            if text:
+                await transcription_cache.set(hash_key, text)
+    finally:
+        audio.close()
+    if text:
+        await transcription_cache.set(id_key, text)
+    return text
+
+
+def voice_stats() -> dict:
+    """
+    Голосовые: в памяти / на диске, байт мимо диска (всего и на сообщение), попадания в кэш,
+    среднее время загрузки и распознавания (мс). Сэкономленные мс не измеряются — нет
+    базовой линии с временным файлом.
+    """
+    messages = _stats["messages"]
+    in_memory = _stats["in_memory"]
+    transcriptions = _stats["transcriptions"]
+    return {
+        "backend": _backend(),
+        "messages": messages,
+        "in_memory": in_memory,
+        "spilled": _stats["spilled"],
+        "bytes_off_disk": _stats["bytes_in_memory"],
+        "bytes_off_disk_per_message": round(_stats["bytes_in_memory"] / in_memory) if in_memory else 0,
+        "download_ms_avg": round(_stats["download_ms"] / messages, 1) if messages else 0.0,
+        "transcriptions": transcriptions,
+        "cache_hits_file": _stats["cache_hits_file"],
+        "cache_hits_hash": _stats["cache_hits_hash"],
+        "transcribe_ms_avg": round(_stats["transcribe_ms"] / transcriptions, 1) if transcriptions else 0.0,
+    }
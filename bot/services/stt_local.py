@@ -0,0 +1,36 @@
+"""
+Локальное распознавание речи (faster-whisper, CPU) для пула процессов.
+
+Модуль импортируется в процессах-воркерах, поэтому не тянет ничего, кроме faster-whisper.
+Воркер (spawn) заново импортирует и main.py — там всё под защитой __name__, бот собирается
+в bot/app.py. Модель загружается один раз на процесс в init_worker(), дальше transcribe()
+только считает.
+"""
+import io
+
+try:
+    import numpy as np
+    from faster_whisper import WhisperModel
+    HAS_FASTER_WHISPER = True
+except ImportError:
+    HAS_FASTER_WHISPER = False
+
+_model = None
+
+
+def init_worker(model_name: str, compute_type: str, cpu_threads: int) -> None:
+    """initializer для ProcessPoolExecutor: загрузка модели в процесс-воркер."""
+    global _model
+    _model = WhisperModel(model_name, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+
+
+def warm_up() -> None:
+    """Прогон секунды тишины: первый вызов модели заметно медленнее последующих."""
+    segments, _ = _model.transcribe(np.zeros(16000, dtype=np.float32), language="es")
+    list(segments)
+
+
+def transcribe(data: bytes) -> str:
+    """Распознаёт запись (ogg/opus и др. — декодирует PyAV) на испанском."""
+    segments, _ = _model.transcribe(io.BytesIO(data), language="es", vad_filter=True)
+    return " ".join(segment.text.strip() for segment in segments).strip()
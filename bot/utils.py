@@ -55,11 +55,12 @@ def _iter_cards_with_transcription(obj) -> "list[dict]":
     return result
 
 
-def _load_transcription_lookup() -> dict[str, str]:
+# Файлы data/ со словарём и транскрипциями (отслеживаются при горячей перезагрузке контента)
+TRANSCRIPTION_FILES = ("cards_seed.json", "cards_zero.json", "a1_transcriptions.json", "a2_transcriptions.json")
+
+
+def _build_transcription_lookup() -> dict[str, str]:
     """Загружает cards_seed.json и cards_zero.json, строит lookup id/spanish -> transcription."""
-    global _TRANSCRIPTION_CACHE
-    if _TRANSCRIPTION_CACHE is not None:
-        return _TRANSCRIPTION_CACHE
     lookup: dict[str, str] = {}
     data_dir = Path(__file__).parent.parent / "data"
     for filename in ("cards_seed.json", "cards_zero.json"):
@@ -92,10 +93,22 @@ def _load_transcription_lookup() -> dict[str, str]:
                         lookup[_slug_for_lookup(spanish)] = t
             except Exception:
                 pass
-    _TRANSCRIPTION_CACHE = lookup
     return lookup
 
 
+def _load_transcription_lookup() -> dict[str, str]:
+    global _TRANSCRIPTION_CACHE
+    if _TRANSCRIPTION_CACHE is None:
+        _TRANSCRIPTION_CACHE = _build_transcription_lookup()
+    return _TRANSCRIPTION_CACHE
+
+
+def reload_transcriptions() -> None:
+    """Перечитывает словарь транскрипций и атомарно подменяет кэш."""
+    global _TRANSCRIPTION_CACHE
+    _TRANSCRIPTION_CACHE = _build_transcription_lookup()
+
+
 def get_transcription_for_card(card: dict) -> str | None:
     """Возвращает транскрипцию для карточки: из самой карточки или из cards_seed по card_id/spanish."""
     t = card.get("transcription")
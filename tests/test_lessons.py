@@ -0,0 +1,58 @@
+import json
+import os
+
+import pytest
+
+from bot.services.lessons import LessonRegistry
+
+_CARDS = [{"spanish": "hola", "russian": "привет"}]
+
+
+def _registry(tmp_path, folder: str, files: dict[str, dict]) -> LessonRegistry:
+    (tmp_path / folder).mkdir()
+    for name, lesson in files.items():
+        (tmp_path / folder / name).write_text(json.dumps(lesson, ensure_ascii=False), encoding="utf-8")
+    registry = LessonRegistry(tmp_path)
+    registry.load()
+    return registry
+
+
+@pytest.mark.parametrize("quiz", [
+    {"questions": ["x"]},
+    {"questions": [{"options": ["a", "b"], "correct_index": "1"}]},
+    {"questions": [{"options": "ab", "correct_index": 1}]},
+    {"questions": "x"},
+    ["x"],
+])
+def test_malformed_zero_quiz_skips_only_that_file(tmp_path, quiz):
+    valid = {"cards": _CARDS, "quiz": {"questions": [{"options": ["a", "b"], "correct_index": 1}]}}
+    registry = _registry(tmp_path, "zero_lessons", {
+        "zero_01.json": valid,
+        "zero_02.json": {"cards": _CARDS, "quiz": quiz},
+    })
+    assert registry.count("ZERO") == 1
+    assert registry.exists("ZERO", 1)
+
+
+def test_choice_with_non_integer_index_is_skipped(tmp_path):
+    registry = _registry(tmp_path, "a1_lessons", {
+        "a1_01.json": {"exercises": [{"type": "choice", "options": ["a", "b"], "correct_index": 0}]},
+        "a1_02.json": {"exercises": [{"type": "choice", "options": ["a", "b"], "correct_index": "0"}]},
+    })
+    assert registry.count("A1") == 1
+    assert registry.exists("A1", 1)
+
+
+def test_only_current_and_previous_versions_are_kept(tmp_path):
+    path = tmp_path / "a1_lessons" / "a1_01.json"
+    registry = _registry(tmp_path, "a1_lessons", {"a1_01.json": {"title": "v1", "exercises": []}})
+    hashes = [registry.get_hash("A1", 1)]
+    for n, title in enumerate(("v2", "v3"), 2):
+        path.write_text(json.dumps({"title": title, "exercises": []}), encoding="utf-8")
+        os.utime(path, ns=(n * 10**9, n * 10**9))
+        assert registry.reload_changed() == ["a1_01.json"]
+        hashes.append(registry.get_hash("A1", 1))
+
+    assert registry.get_by_hash(hashes[0]) is None
+    assert registry.get_by_hash(hashes[1])["title"] == "v2"
+    assert registry.get_by_hash(hashes[2])["title"] == "v3"
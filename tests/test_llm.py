@@ -0,0 +1,30 @@
+from types import SimpleNamespace
+
+import pytest
+from openai import BadRequestError
+
+from bot.services.llm import _json_mode_unsupported
+
+
+def _bad_request(message: str, param: str | None = None) -> BadRequestError:
+    response = SimpleNamespace(request=None, status_code=400, headers={})
+    body = {"message": message, "type": "invalid_request_error", "param": param, "code": None}
+    return BadRequestError(message, response=response, body=body)
+
+
+@pytest.mark.parametrize("error", [
+    _bad_request("Invalid parameter", param="response_format"),
+    _bad_request("Invalid schema for response_format 'grading'", param="response_format.json_schema"),
+    _bad_request("json_schema is not supported with this model"),
+])
+def test_response_format_errors_switch_to_json_object(error):
+    assert _json_mode_unsupported(error)
+
+
+@pytest.mark.parametrize("error", [
+    _bad_request("This model's maximum context length is 128000 tokens", param="messages"),
+    _bad_request("Your request was rejected as a result of our safety system"),
+    ValueError("response_format"),
+])
+def test_other_errors_keep_structured_output(error):
+    assert not _json_mode_unsupported(error)
@@ -0,0 +1,34 @@
+from bot.services.local_grader import AMBIGUOUS, CORRECT, WRONG, grade_locally
+
+
+def test_exact_and_normalized_answers_are_correct():
+    assert grade_locally("Ella es de Madrid", "Ella es de Madrid").verdict == CORRECT
+    assert grade_locally("¿como estas?", "¿Cómo estás?").verdict == CORRECT
+
+
+def test_omitted_subject_pronoun_is_a_variant():
+    verdict = grade_locally("Vivo en Madrid", "Yo vivo en Madrid")
+    assert (verdict.verdict, verdict.reason) == (CORRECT, "variant")
+
+
+def test_accepted_answers_are_variants():
+    verdict = grade_locally("Buenas", "Buenas tardes", accepted=["Buenas"])
+    assert (verdict.verdict, verdict.reason) == (CORRECT, "variant")
+
+
+def test_different_subject_pronoun_is_not_correct():
+    assert grade_locally("Yo es de Madrid", "Ella es de Madrid").verdict == AMBIGUOUS
+    assert grade_locally("Ellos vivo en Madrid", "Yo vivo en Madrid").verdict == AMBIGUOUS
+
+
+def test_added_pronoun_is_left_to_llm():
+    assert grade_locally("Yo vivo en Madrid", "Vivo en Madrid").verdict == AMBIGUOUS
+
+
+def test_number_gender_is_not_folded():
+    assert grade_locally("uno casa", "una casa").verdict == AMBIGUOUS
+
+
+def test_unrelated_and_empty_answers_are_wrong():
+    assert grade_locally("perro", "Buenos días, ¿qué tal?").verdict == WRONG
+    assert grade_locally("  ", "Hola").verdict == WRONG
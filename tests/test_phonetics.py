@@ -0,0 +1,55 @@
+import pytest
+
+from bot.services.local_grader import AMBIGUOUS, CORRECT, WRONG
+from bot.services.phonetics import score_pronunciation, to_phonemes
+
+
+def test_spanish_grapheme_to_phoneme_rules():
+    phonemes = "".join(p for p, _ in to_phonemes("Chorizo, guitarra, pingüino, hoy, cielo, llave, jamón, vaca"))
+    assert phonemes == "ʧoɾisogitarapingwinooisieloʎabexamónbaka"
+
+
+@pytest.mark.parametrize("expected, recognized", [
+    ("¿Cómo te llamas?", "¿Cómo te llamas"),
+    ("Quiero un vaso de agua.", "Quiero un baso de agua."),
+    ("Tengo dos hermanos.", "Tengo 2 hermanos"),
+    ("Voy a ver la película.", "Voy haber la película"),
+])
+def test_same_sound_is_exact(expected, recognized):
+    result = score_pronunciation(expected, recognized)
+    assert (result.verdict, result.reason) == (CORRECT, "exact")
+
+
+@pytest.mark.parametrize("expected, recognized, kind", [
+    ("Mañana voy a la playa.", "Manana voy a la playa", "ñ"),
+    ("¿Cómo te llamas?", "¿Cómo te yamas?", "ll"),
+    ("El perro corre rápido.", "El pero core rápido.", "rr"),
+    ("Me gusta el jamón.", "Me gusta el gamón.", "j_g"),
+    ("Esta casa es bonita.", "Está casa es bonita.", "stress_extra"),
+    ("Él está en casa.", "Él estó en casa.", None),
+])
+def test_typical_errors_are_wrong_locally(expected, recognized, kind):
+    result = score_pronunciation(expected, recognized)
+    if kind is None:
+        # о вместо а — не типичная ошибка
+        assert result.verdict == AMBIGUOUS
+        return
+    assert (result.verdict, result.reason) == (WRONG, "typical")
+    assert result.errors[0].kind == kind
+    assert result.feedback
+
+
+def test_unrelated_phrase_is_wrong_by_distance():
+    result = score_pronunciation("Buenos días, ¿qué tal?", "Me llamo Pedro y vivo en Madrid")
+    assert (result.verdict, result.reason) == (WRONG, "distance")
+
+
+@pytest.mark.parametrize("expected, recognized", [
+    # Whisper не поставил акцент в одном слове — ударение не проверить
+    ("Él está en casa.", "Él esta en casa"),
+    ("¿Cómo te llamas?", "Como te llamas"),
+    ("Está en casa.", "Está en la casa."),
+])
+def test_borderline_answers_go_to_llm(expected, recognized):
+    assert score_pronunciation(expected, recognized).verdict == AMBIGUOUS
+
@@ -0,0 +1,69 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import bot.handlers.a2 as a2
+import bot.handlers.voice as voice
+import bot.services.llm as llm
+
+
+class _Message:
+    def __init__(self) -> None:
+        self.from_user = SimpleNamespace(id=1)
+        self.voice = SimpleNamespace(file_unique_id="test")
+        self.sent: list[str] = []
+
+    async def answer(self, text: str, **kwargs) -> None:
+        self.sent.append(text)
+
+
+class _State:
+    def __init__(self, data: dict) -> None:
+        self.data = data
+
+    async def get_state(self) -> str:
+        return "A2States:exercise"
+
+    async def get_data(self) -> dict:
+        return dict(self.data)
+
+    async def update_data(self, **kwargs) -> None:
+        self.data.update(kwargs)
+
+
+def test_dialogue_answered_by_voice_goes_to_llm(monkeypatch):
+    lesson = {"exercises": [
+        {"type": "dialogue", "question": "Расскажи о себе"},
+        {"type": "dialogue", "question": "Где ты работаешь?"},
+    ]}
+    prompts_sent = []
+
+    async def recognize_voice(bot, voice_note):
+        return "Me llamo Ana y vivo en Madrid"
+
+    async def chat(client, prompt, **kwargs):
+        prompts_sent.append(prompt)
+        content = json.dumps({"correct": True, "feedback_ru": "Хорошо", "corrected": ""})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    async def record_voice_practice(message):
+        pass
+
+    async def show_exercise(message, state, exercise, index):
+        pass
+
+    monkeypatch.setattr(voice, "recognize_voice", recognize_voice)
+    monkeypatch.setattr(voice, "resolve_lesson", lambda data: lesson)
+    monkeypatch.setattr(voice, "_record_voice_practice", record_voice_practice)
+    monkeypatch.setattr(a2, "_show_exercise", show_exercise)
+    monkeypatch.setattr(llm, "_get_llm_client", lambda: object())
+    monkeypatch.setattr(llm, "_chat", chat)
+
+    message = _Message()
+    state = _State({"exercise_index": 0, "lesson_level": "A2"})
+    asyncio.run(voice.handle_voice(message, None, state))
+
+    # Заглушка-описание не сравнивается с ответом по звучанию — решает LLM
+    assert len(prompts_sent) == 1
+    assert any(text.startswith("✅") for text in message.sent)
+    assert state.data["exercise_index"] == 1